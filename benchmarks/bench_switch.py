@@ -0,0 +1,215 @@
+"""Benchmark of the event handling of ZonedHeaterSwitch.
+
+Runs the integration against the in-process stand-in of Home Assistant with
+synthetic workloads, and reports per workload and number of zones:
+the handling time per zone event, the number of override calculations per
+event, the controller service calls per (virtual) hour and the peak memory.
+
+Usage, from the root of the repository:
+
+    python -m benchmarks.bench_switch
+    python -m benchmarks.bench_switch --zones 5 50 --workload burst --hours 4 --json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from homeassistant.const import ATTR_TEMPERATURE, ATTR_SUPPORTED_FEATURES
+from homeassistant.components.climate.const import (
+    ATTR_CURRENT_TEMPERATURE,
+    ATTR_HVAC_MODES,
+    ATTR_TARGET_TEMP_STEP,
+    ClimateEntityFeature,
+    HVACMode,
+)
+
+from .fake_hass import (
+    FakeHass,
+    VirtualClock,
+    async_create_switch,
+    patch_homeassistant,
+)
+
+CONTROLLER = "climate.boiler"
+
+
+def zone_ids(count: int):
+    return ["climate.zone_{:03d}".format(i) for i in range(count)]
+
+
+def workload_steady(rng: random.Random, zones: list, duration: float):
+    """zones report every minute with a slowly drifting temperature, plus battery/link updates"""
+    current = {zone: rng.uniform(19, 20.5) for zone in zones}
+    for zone in zones:
+        offset = rng.uniform(0, 60)
+        while offset < duration:
+            current[zone] = round(current[zone] + rng.uniform(-0.1, 0.1), 1)
+            yield offset, zone, None, {ATTR_CURRENT_TEMPERATURE: current[zone]}
+            if rng.random() < 0.2:
+                yield offset + 1, zone, None, {"battery": rng.randint(20, 100), "linkquality": rng.randint(0, 255)}
+            offset += 60
+
+
+def workload_burst(rng: random.Random, zones: list, duration: float):
+    """a schedule changes the setpoint of all zones at once, every 15 minutes"""
+    current = {zone: rng.uniform(19, 20.5) for zone in zones}
+    offset = 0
+    setpoints = [17.0, 21.0]
+    while offset < duration:
+        setpoint = setpoints[int(offset // 900) % 2]
+        for zone in zones:
+            yield offset + rng.uniform(0, 1), zone, None, {ATTR_TEMPERATURE: setpoint}
+            for minute in range(1, 15):
+                current[zone] = round(current[zone] + (0.05 if setpoint > current[zone] else -0.05), 2)
+                yield offset + minute * 60 + rng.uniform(0, 60), zone, None, {ATTR_CURRENT_TEMPERATURE: current[zone]}
+        offset += 900
+
+
+def workload_noisy(rng: random.Random, zones: list, duration: float):
+    """sensors report every 10 seconds with 0.01 degree jitter"""
+    base = {zone: rng.uniform(19, 20.5) for zone in zones}
+    for zone in zones:
+        offset = rng.uniform(0, 10)
+        while offset < duration:
+            yield offset, zone, None, {ATTR_CURRENT_TEMPERATURE: round(base[zone] + rng.gauss(0, 0.03), 2)}
+            offset += 10
+
+
+WORKLOADS = {
+    "steady": workload_steady,
+    "burst": workload_burst,
+    "noisy": workload_noisy,
+}
+
+
+def setup_states(hass: FakeHass, rng: random.Random, zones: list):
+    hass.states.async_set(CONTROLLER, HVACMode.OFF, {
+        ATTR_TEMPERATURE: 18.0,
+        ATTR_CURRENT_TEMPERATURE: 19.5,
+        ATTR_TARGET_TEMP_STEP: 0.5,
+        ATTR_HVAC_MODES: [HVACMode.OFF, HVACMode.HEAT],
+        ATTR_SUPPORTED_FEATURES: ClimateEntityFeature.TARGET_TEMPERATURE,
+    })
+    for zone in zones:
+        hass.states.async_set(zone, HVACMode.HEAT, {
+            ATTR_TEMPERATURE: 20.0,
+            ATTR_CURRENT_TEMPERATURE: round(rng.uniform(19, 20.5), 1),
+        })
+
+
+async def async_run(workload: str, zone_count: int, hours: float, latency: float, seed: int, options: dict, trace_memory: bool):
+    rng = random.Random(seed)
+    zones = zone_ids(zone_count)
+    duration = hours * 3600
+    events = sorted(WORKLOADS[workload](rng, zones, duration), key=lambda event: event[0])
+
+    clock = VirtualClock()
+    hass = FakeHass(clock, service_latency=latency)
+    with patch_homeassistant(hass):
+        setup_states(hass, rng, zones)
+        if trace_memory:
+            tracemalloc.start()
+        entity = await async_create_switch(hass, CONTROLLER, zones, **options)
+
+        evaluations = 0
+        calculate_override = entity.async_calculate_override
+
+        async def async_counted_calculate_override():
+            nonlocal evaluations
+            evaluations += 1
+            await calculate_override()
+        entity.async_calculate_override = async_counted_calculate_override
+
+        start = clock.now
+        calls_before = len(hass.services.calls_for(CONTROLLER))
+        latencies = []
+        for offset, entity_id, new_state, changes in events:
+            await hass.async_advance(start + datetime.timedelta(seconds=offset))
+            state = hass.states.get(entity_id)
+            attributes = dict(state.attributes)
+            attributes.update(changes)
+            started = time.perf_counter()
+            hass.states.async_set(entity_id, new_state or state.state, attributes)
+            await hass.async_block_till_done()
+            latencies.append(time.perf_counter() - started)
+        await hass.async_advance(start + datetime.timedelta(seconds=duration))
+
+        peak_memory = None
+        if trace_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        await entity.async_will_remove_from_hass()
+
+    controller_calls = len(hass.services.calls_for(CONTROLLER)) - calls_before
+    latencies.sort()
+    return {
+        "workload": workload,
+        "zones": zone_count,
+        "events": len(events),
+        "latency_p50_us": round(statistics.median(latencies) * 1e6, 1) if latencies else None,
+        "latency_p95_us": round(latencies[int(len(latencies) * 0.95)] * 1e6, 1) if latencies else None,
+        "latency_max_us": round(latencies[-1] * 1e6, 1) if latencies else None,
+        "evaluations_per_event": round(evaluations / len(events), 4) if events else None,
+        "controller_calls_per_hour": round(controller_calls / hours, 1),
+        "state_writes": entity.state_writes,
+        "peak_memory_kib": round(peak_memory / 1024, 1) if peak_memory is not None else None,
+    }
+
+
+async def async_benchmark(args):
+    options = json.loads(args.options) if args.options else {}
+    results = []
+    for workload in args.workload:
+        for zone_count in args.zones:
+            result = await async_run(workload, zone_count, args.hours, args.latency, args.seed, dict(options), False)
+            if not args.no_memory:
+                memory = await async_run(workload, zone_count, args.hours, args.latency, args.seed, dict(options), True)
+                result["peak_memory_kib"] = memory["peak_memory_kib"]
+            results.append(result)
+            if not args.json:
+                print_result(result, header=len(results) == 1)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    return results
+
+
+COLUMNS = [
+    ("workload", 8),
+    ("zones", 6),
+    ("events", 8),
+    ("latency_p50_us", 15),
+    ("latency_p95_us", 15),
+    ("latency_max_us", 15),
+    ("evaluations_per_event", 22),
+    ("controller_calls_per_hour", 26),
+    ("state_writes", 13),
+    ("peak_memory_kib", 16),
+]
+
+
+def print_result(result: dict, header: bool):
+    if header:
+        print(" ".join(name.rjust(width) for name, width in COLUMNS))
+    print(" ".join(str(result[name]).rjust(width) for name, width in COLUMNS), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workload", nargs="+", choices=sorted(WORKLOADS), default=sorted(WORKLOADS))
+    parser.add_argument("--zones", nargs="+", type=int, default=[5, 50, 500])
+    parser.add_argument("--hours", type=float, default=1, help="virtual duration of each run")
+    parser.add_argument("--latency", type=float, default=0.5, help="virtual duration of a service call, in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--options", help="JSON object with config entry options, e.g. {\"hysteresis\": 0.5}")
+    parser.add_argument("--no-memory", action="store_true", help="skip the run which measures the peak memory")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    asyncio.run(async_benchmark(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
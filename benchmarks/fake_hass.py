@@ -0,0 +1,377 @@
+"""In-process stand-in for Home Assistant, driven by a virtual clock.
+
+Only the parts of Home Assistant which are used by the zoned heating
+integration are implemented: a states registry, an event bus for state
+changes, a service registry which records the calls and simulates their
+latency, and timers. The timers and dt_util.utcnow() follow a virtual clock,
+so hours of operation can be simulated in seconds.
+"""
+import asyncio
+import contextlib
+import datetime
+import heapq
+import importlib
+import itertools
+import os
+import pkgutil
+import tempfile
+from dataclasses import dataclass, field
+
+import homeassistant.util.dt as dt_util
+from homeassistant.const import (
+    ATTR_ENTITY_ID,
+    ATTR_TEMPERATURE,
+    EVENT_STATE_CHANGED,
+    STATE_OFF,
+    STATE_ON,
+)
+from homeassistant.core import (
+    Context,
+    Event,
+    State,
+    is_callback,
+)
+from homeassistant.components.climate.const import ATTR_HVAC_MODE
+from homeassistant.helpers import entity_registry as er
+
+PACKAGE = "custom_components.zoned_heating"
+
+
+class VirtualClock:
+    """Clock with timers which only advances when asked to."""
+
+    def __init__(self, start: datetime.datetime = None):
+        self.now = start or datetime.datetime(2024, 1, 1, tzinfo=dt_util.UTC)
+        self._timers = []
+        self._sequence = itertools.count()
+
+    def utcnow(self):
+        return self.now
+
+    def schedule(self, when: datetime.datetime, action):
+        """call action(when) once the clock reaches when, returns a function to cancel it"""
+        timer = [max(when, self.now), next(self._sequence), action, True]
+        heapq.heappush(self._timers, timer)
+
+        def cancel():
+            timer[3] = False
+        return cancel
+
+    def next_timer(self):
+        """return the time of the first pending timer, or None"""
+        while self._timers and not self._timers[0][3]:
+            heapq.heappop(self._timers)
+        return self._timers[0][0] if self._timers else None
+
+    def pop_timer(self, until: datetime.datetime):
+        """advance to the first timer due before until and return its action, or None"""
+        when = self.next_timer()
+        if when is None or when > until:
+            return None
+        timer = heapq.heappop(self._timers)
+        self.now = max(self.now, when)
+        return timer[2]
+
+
+@dataclass
+class ServiceCallRecord:
+    """A service call received by the stand-in."""
+
+    time: datetime.datetime
+    domain: str
+    service: str
+    data: dict
+    entity_ids: list
+    context: Context = None
+    duration: float = 0
+    error: Exception = field(default=None, repr=False)
+
+
+class FakeStates:
+    """States registry which fires state_changed events."""
+
+    def __init__(self, hass):
+        self._hass = hass
+        self._states = {}
+
+    def get(self, entity_id: str):
+        return self._states.get(entity_id)
+
+    def async_entity_ids(self, domain_filter: str = None):
+        return [
+            entity_id
+            for entity_id in self._states
+            if domain_filter is None or entity_id.startswith(domain_filter + ".")
+        ]
+
+    def async_all(self):
+        return list(self._states.values())
+
+    def async_set(self, entity_id: str, new_state: str, attributes: dict = None, context: Context = None):
+        """set the state of an entity, firing an event when it changed"""
+        old_state = self._states.get(entity_id)
+        attributes = dict(attributes or {})
+        if old_state and old_state.state == new_state and dict(old_state.attributes) == attributes:
+            return old_state
+        now = self._hass.clock.now
+        state = State(
+            entity_id,
+            new_state,
+            attributes,
+            last_changed=old_state.last_changed if old_state and old_state.state == new_state else now,
+            last_updated=now,
+            context=context or Context(),
+        )
+        self._states[entity_id] = state
+        self._hass.bus.async_fire_state_changed(entity_id, old_state, state)
+        return state
+
+    def async_update_attributes(self, entity_id: str, context: Context = None, **changes):
+        """change some attributes of an entity"""
+        state = self._states[entity_id]
+        attributes = dict(state.attributes)
+        attributes.update(changes)
+        return self.async_set(entity_id, state.state, attributes, context)
+
+
+class FakeBus:
+    """Event bus for state changes of specific entities."""
+
+    def __init__(self, hass):
+        self._hass = hass
+        self._listeners = {}
+        self.events_fired = 0
+
+    def async_track_state_change_event(self, entity_ids, action):
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_ids]
+        entity_ids = list(entity_ids)
+        for entity_id in entity_ids:
+            self._listeners.setdefault(entity_id, []).append(action)
+
+        def remove():
+            for entity_id in entity_ids:
+                listeners = self._listeners.get(entity_id, [])
+                if action in listeners:
+                    listeners.remove(action)
+        return remove
+
+    def listener_count(self):
+        return sum(len(listeners) for listeners in self._listeners.values())
+
+    def async_fire_state_changed(self, entity_id: str, old_state: State, new_state: State):
+        listeners = self._listeners.get(entity_id)
+        if not listeners:
+            return
+        self.events_fired += 1
+        event = Event(
+            EVENT_STATE_CHANGED,
+            {
+                ATTR_ENTITY_ID: entity_id,
+                "old_state": old_state,
+                "new_state": new_state,
+            },
+            time_fired=self._hass.clock.now,
+            context=new_state.context,
+        )
+        # Home Assistant links a new context to the event it originates from, which
+        # makes each state keep its predecessors alive in this stand-in
+        new_state.context.origin_event = None
+        for action in list(listeners):
+            if is_callback(action):
+                action(event)
+            else:
+                self._hass.async_create_task(action(event))
+
+
+class FakeServices:
+    """Service registry which records every call.
+
+    Each call takes `latency` seconds of virtual time. The climate and switch
+    services are applied to the state of the target entities, using the context
+    of the call, like Home Assistant does.
+    """
+
+    def __init__(self, hass, latency: float = 0):
+        self._hass = hass
+        self.latency = latency
+        self.calls = []
+        self.failures = {}
+
+    async def async_call(self, domain, service, service_data=None, blocking=False, context=None, target=None, **kwargs):
+        data = dict(service_data or {})
+        entity_ids = (target or {}).get(ATTR_ENTITY_ID, data.pop(ATTR_ENTITY_ID, []))
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_ids]
+        record = ServiceCallRecord(self._hass.clock.now, domain, service, data, list(entity_ids), context)
+        self.calls.append(record)
+
+        if self.latency:
+            await self._hass.async_sleep(self.latency)
+        record.duration = (self._hass.clock.now - record.time).total_seconds()
+
+        for entity_id in entity_ids:
+            error = self.failures.get(entity_id)
+            if error:
+                record.error = error
+                raise error
+
+        for entity_id in entity_ids:
+            self._apply(entity_id, service, data, context)
+
+    def _apply(self, entity_id, service, data, context):
+        state = self._hass.states.get(entity_id)
+        if state is None:
+            return
+        new_state = state.state
+        attributes = dict(state.attributes)
+        if service == "turn_on":
+            new_state = STATE_ON
+        elif service == "turn_off":
+            new_state = STATE_OFF
+        if ATTR_HVAC_MODE in data:
+            new_state = str(data[ATTR_HVAC_MODE])
+        if ATTR_TEMPERATURE in data:
+            attributes[ATTR_TEMPERATURE] = data[ATTR_TEMPERATURE]
+        self._hass.states.async_set(entity_id, new_state, attributes, context)
+
+    def calls_for(self, entity_id: str):
+        return [call for call in self.calls if entity_id in call.entity_ids]
+
+
+class FakeEntityRegistry:
+    """Entity registry without entries."""
+
+    def async_get(self, entity_id: str):
+        return None
+
+
+class FakeConfig:
+    """Configuration with a temporary config directory."""
+
+    def __init__(self, config_dir: str):
+        self.config_dir = config_dir
+
+    def path(self, *path):
+        return os.path.join(self.config_dir, *path)
+
+
+class FakeHass:
+    """The hass object handed to the integration."""
+
+    def __init__(self, clock: VirtualClock = None, service_latency: float = 0, config_dir: str = None):
+        self.loop = asyncio.get_running_loop()
+        self.clock = clock or VirtualClock()
+        self.data = {er.DATA_REGISTRY: FakeEntityRegistry()}
+        self.config = FakeConfig(config_dir or tempfile.gettempdir())
+        self.states = FakeStates(self)
+        self.bus = FakeBus(self)
+        self.services = FakeServices(self, service_latency)
+        self._tasks = set()
+        self.tasks_created = 0
+        # the integration is set up after Home Assistant has started
+        self.is_running = True
+
+    def async_create_task(self, target, name=None, eager_start=False):
+        task = self.loop.create_task(target)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self.tasks_created += 1
+        return task
+
+    def async_add_executor_job(self, target, *args):
+        return self.loop.run_in_executor(None, target, *args)
+
+    def async_sleep(self, seconds: float):
+        """future which completes after seconds of virtual time"""
+        future = self.loop.create_future()
+
+        def wake(now):
+            if not future.done():
+                future.set_result(None)
+        self.clock.schedule(self.clock.now + datetime.timedelta(seconds=seconds), wake)
+        return future
+
+    async def async_block_till_done(self):
+        """run the loop until all tasks are done or wait for the virtual clock"""
+        idle = 0
+        while idle < 3:
+            progress = (len(self._tasks), self.tasks_created, self.bus.events_fired)
+            await asyncio.sleep(0)
+            if progress == (len(self._tasks), self.tasks_created, self.bus.events_fired):
+                idle += 1
+            else:
+                idle = 0
+
+    async def async_advance(self, until: datetime.datetime):
+        """advance the virtual clock to until, running the timers which are due"""
+        await self.async_block_till_done()
+        while True:
+            action = self.clock.pop_timer(until)
+            if action is None:
+                break
+            action(self.clock.now)
+            await self.async_block_till_done()
+        self.clock.now = max(self.clock.now, until)
+
+    async def async_advance_by(self, seconds: float):
+        await self.async_advance(self.clock.now + datetime.timedelta(seconds=seconds))
+
+
+def _fake_track_state_change_event(hass, entity_ids, action):
+    return hass.bus.async_track_state_change_event(entity_ids, action)
+
+
+def _fake_track_point_in_time(hass, action, point_in_time):
+    return hass.clock.schedule(point_in_time, action)
+
+
+@contextlib.contextmanager
+def patch_homeassistant(hass: FakeHass):
+    """point the time related helpers used by the integration to the stand-in"""
+    original_utcnow = dt_util.utcnow
+    originals = []
+    dt_util.utcnow = hass.clock.utcnow
+    try:
+        package = importlib.import_module(PACKAGE)
+        for module_info in pkgutil.iter_modules(package.__path__):
+            module = importlib.import_module("{}.{}".format(PACKAGE, module_info.name))
+            for attr, fake in [
+                ("async_track_state_change_event", _fake_track_state_change_event),
+                ("async_track_point_in_time", _fake_track_point_in_time),
+            ]:
+                if hasattr(module, attr):
+                    originals.append((module, attr, getattr(module, attr)))
+                    setattr(module, attr, fake)
+        yield hass
+    finally:
+        for module, attr, original in originals:
+            setattr(module, attr, original)
+        dt_util.utcnow = original_utcnow
+
+
+async def async_create_switch(hass: FakeHass, controller: str, zones: list, last_state: State = None, **options):
+    """create a ZonedHeaterSwitch from config entry options and add it like Home Assistant would"""
+    from custom_components.zoned_heating import const
+    from custom_components.zoned_heating.switch import create_switch
+
+    hass.data.setdefault(const.DOMAIN, {})
+    options[const.CONF_CONTROLLER] = controller
+    options[const.CONF_ZONES] = zones
+    options.setdefault(const.CONF_MAX_SETPOINT, const.DEFAULT_MAX_SETPOINT)
+    entity = create_switch(hass, options)
+    entity.entity_id = "switch.zoned_heating"
+    entity.state_writes = 0
+
+    async def async_last_state():
+        return last_state
+
+    def async_write_ha_state():
+        entity.state_writes += 1
+
+    entity.async_get_last_state = async_last_state
+    entity.async_write_ha_state = async_write_ha_state
+
+    await entity.async_added_to_hass()
+    await hass.async_block_till_done()
+    return entity
@@ -0,0 +1,184 @@
+"""Replay an event log of zoned heating on a virtual clock.
+
+The event log is recorded by the integration when the 'event_log' option is
+enabled. The zone events and the changes of the controller which were not
+caused by zoned heating itself are fed to a new ZonedHeaterSwitch, faster than
+real time; of each record only what it changed is applied to the replayed
+state. The commands it sends are compared with the recorded ones.
+
+Usage, from the root of the repository:
+
+    python -m benchmarks.replay zoned_heating_events.jsonl
+    python -m benchmarks.replay zoned_heating_events.jsonl --set hysteresis=0.5 --set min_on_time=600 --commands
+"""
+import argparse
+import asyncio
+import collections
+import datetime
+import json
+import time
+
+import homeassistant.util.dt as dt_util
+from homeassistant.const import STATE_ON, STATE_OFF
+from homeassistant.core import State
+
+from custom_components.zoned_heating import const
+from custom_components.zoned_heating.controller import (
+    COMMAND_STATE,
+    COMMAND_TEMPERATURE,
+    COMMAND_STATE_TEMPERATURE,
+)
+from custom_components.zoned_heating.event_log import (
+    read_event_log,
+    RECORD_START,
+    RECORD_STATE,
+    RECORD_COMMAND,
+    RECORD_OPTIONS,
+)
+
+from .fake_hass import (
+    FakeHass,
+    VirtualClock,
+    async_create_switch,
+    patch_homeassistant,
+)
+
+
+def command_kind(call):
+    """kind of controller command of a recorded service call"""
+    if call.service == "set_temperature":
+        return COMMAND_STATE_TEMPERATURE if "hvac_mode" in call.data else COMMAND_TEMPERATURE
+    return COMMAND_STATE
+
+
+def parse_value(value: str):
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+async def async_replay(records: list, overrides: dict, latency: float = 0, settle_time: float = 60):
+    """replay the records, returns a summary of the recorded and replayed commands"""
+    start = next((record for record in records if record["type"] == RECORD_START), None)
+    if start is None:
+        raise ValueError("The event log does not contain a start record")
+    records = records[records.index(start) + 1:]
+
+    options = dict(start["options"])
+    options.update(overrides)
+    controller = options.pop(const.CONF_CONTROLLER)
+    zones = options.pop(const.CONF_ZONES)
+    own_contexts = {
+        record["context"]
+        for record in records
+        if record["type"] == RECORD_COMMAND
+    }
+
+    clock = VirtualClock(dt_util.utc_from_timestamp(start["t"]))
+    hass = FakeHass(clock, service_latency=latency)
+    with patch_homeassistant(hass):
+        # the states as recorded, to tell what a record changed
+        recorded = {}
+        for entity_id, state in start["states"].items():
+            if state is not None:
+                hass.states.async_set(entity_id, state[0], state[1])
+                recorded[entity_id] = state
+
+        last_state = State(
+            "switch.zoned_heating",
+            STATE_ON if start.get("enabled", True) else STATE_OFF,
+            {
+                const.ATTR_OVERRIDE_ACTIVE: start.get("override_active"),
+                const.ATTR_STORED_CONTROLLER_STATE: start.get("stored_controller_state"),
+                const.ATTR_STORED_CONTROLLER_SETPOINT: start.get("stored_controller_setpoint"),
+            },
+        )
+        entity = await async_create_switch(hass, controller, zones, last_state=last_state, **options)
+
+        started = time.perf_counter()
+        replayed_events = 0
+        for record in records:
+            if record["type"] == RECORD_OPTIONS:
+                await hass.async_advance(dt_util.utc_from_timestamp(record["t"]))
+                await entity.async_apply_options({**record["options"], **overrides})
+                continue
+            if record["type"] != RECORD_STATE or record.get("state") is None:
+                continue
+            previous = recorded.get(record["entity"])
+            recorded[record["entity"]] = record["state"]
+            if record["entity"] == controller and record.get("context") in own_contexts:
+                # result of a recorded command, the replayed commands cause their own
+                continue
+            await hass.async_advance(dt_util.utc_from_timestamp(record["t"]))
+            new_state, attributes = record["state"]
+            current = hass.states.get(record["entity"])
+            if current is not None and previous is not None:
+                # only what the record changed is applied, the replayed state can differ from the
+                # recorded one, e.g. when the replayed override does not run at the same time
+                previous_state, previous_attributes = previous
+                if new_state == previous_state:
+                    new_state = current.state
+                changed = {
+                    key: value
+                    for key, value in attributes.items()
+                    if previous_attributes.get(key) != value
+                }
+                attributes = {
+                    key: value
+                    for key, value in current.attributes.items()
+                    if key in attributes or key not in previous_attributes
+                }
+                attributes.update(changed)
+            hass.states.async_set(record["entity"], new_state, attributes)
+            replayed_events += 1
+
+        end = dt_util.utc_from_timestamp(records[-1]["t"] if records else start["t"])
+        await hass.async_advance(end + datetime.timedelta(seconds=settle_time))
+        elapsed = time.perf_counter() - started
+        await entity.async_will_remove_from_hass()
+
+    virtual_duration = (end - dt_util.utc_from_timestamp(start["t"])).total_seconds()
+    replayed_calls = hass.services.calls_for(controller)
+    return {
+        "events": replayed_events,
+        "virtual_duration_s": round(virtual_duration, 1),
+        "replay_duration_s": round(elapsed, 3),
+        "speedup": round(virtual_duration / elapsed, 1) if elapsed else None,
+        "recorded_commands": dict(collections.Counter(
+            record["command"] for record in records if record["type"] == RECORD_COMMAND
+        )),
+        "replayed_commands": dict(collections.Counter(command_kind(call) for call in replayed_calls)),
+        "zone_commands": len(hass.services.calls) - len(replayed_calls),
+        "commands": [
+            {
+                "time": call.time.isoformat(),
+                "service": "{}.{}".format(call.domain, call.service),
+                "data": {key: str(value) for key, value in call.data.items()},
+            }
+            for call in replayed_calls
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("event_log", help="path of the event log")
+    parser.add_argument("--set", action="append", default=[], metavar="OPTION=VALUE", help="override an option of the recorded config entry")
+    parser.add_argument("--latency", type=float, default=0, help="virtual duration of a service call, in seconds")
+    parser.add_argument("--commands", action="store_true", help="list the replayed controller commands")
+    args = parser.parse_args()
+
+    overrides = {}
+    for item in args.set:
+        key, _, value = item.partition("=")
+        overrides[key] = parse_value(value)
+
+    result = asyncio.run(async_replay(read_event_log(args.event_log), overrides, args.latency))
+    if not args.commands:
+        result.pop("commands")
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
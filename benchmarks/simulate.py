@@ -0,0 +1,340 @@
+"""Thermal simulation for tuning the settings of zoned heating.
+
+The zones and the room of the controller are modelled as first-order thermal
+systems, which are heated by the boiler while it fires and (for the zones)
+while the valve of the zone is open. The override logic of ZonedHeaterSwitch
+is evaluated on every time step: the dominant temperature increase is compared
+with the hysteresis and stop threshold (with minimum on- and off-time), and
+the override setpoint is the current temperature of the controller plus the
+temperature increase, limited to the maximum setpoint and quantized to the
+setpoint step of the controller. Commands reach the controller after the
+controller delay time.
+
+All combinations of the given settings are simulated at once, as arrays with
+one row per combination. Per combination it reports the number of boiler
+starts, the overshoot of the zones above their setpoint, the mean time for a
+zone to reach a raised setpoint and the number of controller commands.
+
+Requires numpy, which is not a dependency of the integration. Usage, from the
+root of the repository:
+
+    python -m benchmarks.simulate
+    python -m benchmarks.simulate --hysteresis 0.2:1.5:0.1 --max-setpoint 19:23:0.5 --controller-delay-time 0 10 30 --top 10
+"""
+import argparse
+import itertools
+import json
+import math
+import time
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from custom_components.zoned_heating import const
+
+# parameters which can be varied, with their default values
+PARAMETERS = {
+    const.CONF_HYSTERESIS: [const.DEFAULT_HYSTERESIS],
+    # capped at the hysteresis, so by default the override stops at the hysteresis
+    const.CONF_STOP_THRESHOLD: [math.inf],
+    const.CONF_MAX_SETPOINT: [const.DEFAULT_MAX_SETPOINT],
+    const.CONF_CONTROLLER_DELAY_TIME: [const.DEFAULT_CONTROLLER_DELAY_TIME],
+    const.CONF_MIN_ON_TIME: [const.DEFAULT_MIN_ON_TIME],
+    const.CONF_MIN_OFF_TIME: [const.DEFAULT_MIN_OFF_TIME],
+}
+
+METRICS = [
+    "boiler_starts",
+    "overshoot_max",
+    "overshoot_mean",
+    "time_to_setpoint_s",
+    "underheating_kh",
+    "controller_commands",
+]
+
+
+class House:
+    """Thermal parameters of the zones and of the room of the controller.
+
+    Each room loses heat to the outside with time constant tau (seconds) and
+    reaches `gain` degrees above the outside temperature when it is heated
+    continuously.
+    """
+
+    def __init__(self, zones: int = 6, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.zones = zones
+        self.zone_tau = rng.uniform(3, 8, zones) * 3600
+        self.zone_gain = rng.uniform(25, 40, zones)
+        self.controller_tau = 5 * 3600
+        self.controller_gain = 30.0
+        # each zone heats up in the morning and evening at a slightly different time
+        self.zone_day_setpoint = rng.choice([19.5, 20.0, 20.5, 21.0], zones)
+        self.zone_night_setpoint = np.full(zones, 16.0)
+        self.zone_morning = rng.uniform(6, 8, zones) * 3600
+        self.zone_evening = rng.uniform(21, 23.5, zones) * 3600
+        self.zone_valve_band = 0.2
+
+    def zone_setpoints(self, t: float):
+        """setpoint of each zone at t seconds after midnight"""
+        seconds = t % 86400
+        day = (seconds >= self.zone_morning) & (seconds < self.zone_evening)
+        return np.where(day, self.zone_day_setpoint, self.zone_night_setpoint)
+
+    @staticmethod
+    def outside_temperature(t: float):
+        """outside temperature, coldest at 4:00"""
+        return 5 - 4 * math.cos(2 * math.pi * ((t % 86400) - 4 * 3600) / 86400)
+
+
+def parameter_grid(values: dict):
+    """arrays with all combinations of the parameter values"""
+    names = list(values)
+    combinations = np.array(list(itertools.product(*(values[name] for name in names))), dtype=float)
+    return {name: combinations[:, index] for index, name in enumerate(names)}
+
+
+def quantize(values, resolution: float):
+    """round values to a resolution, like the integration does"""
+    if not resolution:
+        return values
+    return np.round(np.round(values / resolution) * resolution, 4)
+
+
+def simulate(
+    grid: dict,
+    house: House,
+    duration: float = 86400,
+    step: float = 30,
+    controller_setpoint: float = 15.0,
+    controller_heat: bool = True,
+    setpoint_step: float = 0.5,
+    temperature_resolution: float = const.DEFAULT_TEMPERATURE_RESOLUTION,
+    boiler_band: float = 0.3,
+):
+    """simulate all parameter combinations of the grid, returns a dict with an array per metric"""
+    count = len(next(iter(grid.values())))
+    zones = house.zones
+    hysteresis = grid[const.CONF_HYSTERESIS]
+    stop_threshold = np.minimum(grid[const.CONF_STOP_THRESHOLD], hysteresis)
+    max_setpoint = grid[const.CONF_MAX_SETPOINT]
+    delay = grid[const.CONF_CONTROLLER_DELAY_TIME]
+    min_on_time = grid[const.CONF_MIN_ON_TIME]
+    min_off_time = grid[const.CONF_MIN_OFF_TIME]
+
+    start_setpoints = house.zone_setpoints(0)
+    zone_temperature = np.tile(start_setpoints, (count, 1)).astype(float)
+    controller_temperature = np.full(count, float(controller_setpoint))
+
+    # controller as seen by the integration, and the command on its way to it
+    mode_heat = np.full(count, controller_heat)
+    setpoint = np.full(count, float(controller_setpoint))
+    pending_at = np.full(count, np.inf)
+    pending_heat = mode_heat.copy()
+    pending_setpoint = setpoint.copy()
+    last_sent_setpoint = np.full(count, np.nan)
+    last_sent_at = np.full(count, -np.inf)
+
+    # override state of the integration
+    override_active = np.zeros(count, dtype=bool)
+    temperature_increase = np.zeros(count)
+    last_transition = np.full(count, -np.inf)
+    stored_heat = mode_heat.copy()
+    stored_setpoint = setpoint.copy()
+
+    firing = np.zeros(count, dtype=bool)
+    valve_open = np.zeros((count, zones), dtype=bool)
+
+    # metrics
+    boiler_starts = np.zeros(count)
+    commands = np.zeros(count)
+    overshoot_max = np.zeros(count)
+    overshoot_sum = np.zeros(count)
+    overshoot_samples = np.zeros(count)
+    time_to_setpoint_sum = np.zeros(count)
+    time_to_setpoint_count = np.zeros(count)
+    underheating = np.zeros(count)
+    waiting_since = np.full((count, zones), np.nan)
+    reached = np.ones((count, zones), dtype=bool)
+    previous_setpoints = start_setpoints
+
+    def send(mask, new_heat, new_setpoint, t):
+        """send a command to the controllers in mask, a newer command replaces a pending one"""
+        nonlocal commands
+        pending_heat[mask] = np.broadcast_to(new_heat, count)[mask]
+        pending_setpoint[mask] = np.broadcast_to(new_setpoint, count)[mask]
+        pending_at[mask] = t + delay[mask]
+        last_sent_setpoint[mask] = np.broadcast_to(new_setpoint, count)[mask]
+        last_sent_at[mask] = t
+        commands += mask
+
+    for t in np.arange(0, duration, step):
+        # the controller takes over the commands which arrived
+        arrived = pending_at <= t
+        mode_heat = np.where(arrived, pending_heat, mode_heat)
+        setpoint = np.where(arrived, pending_setpoint, setpoint)
+        pending_at[arrived] = np.inf
+
+        zone_setpoints = house.zone_setpoints(t)
+        raised = zone_setpoints > previous_setpoints
+        lowered = zone_setpoints < previous_setpoints
+        waiting_since[:, raised] = t
+        reached[:, raised] = False
+        waiting_since[:, lowered] = np.nan
+        reached[:, lowered] = False
+        previous_setpoints = zone_setpoints
+
+        # demand of the zones, as measured with the configured resolution
+        measured = quantize(zone_temperature, temperature_resolution)
+        increase = np.round(np.max(zone_setpoints - measured, axis=1), 1)
+
+        # deadband with minimum on- and off-time (OverrideStateMachine.evaluate)
+        desired = np.where(override_active, increase > stop_threshold, increase > hysteresis)
+        min_time = np.where(desired, min_off_time, min_on_time)
+        transition = (desired != override_active) & (t >= last_transition + min_time)
+        last_transition = np.where(transition, t, last_transition)
+        starting = transition & desired
+        stopping = transition & ~desired
+
+        # restore the stored controller settings (async_stop_override_mode)
+        restore_mode = stopping & (stored_heat != mode_heat)
+        restore_setpoint = stopping & (stored_setpoint != setpoint)
+        send(restore_mode | restore_setpoint, stored_heat, stored_setpoint, t)
+        commands += restore_mode & restore_setpoint
+        override_active = override_active & ~stopping
+        temperature_increase = np.where(stopping, 0, temperature_increase)
+
+        # store the controller settings (async_start_override_mode)
+        stored_heat = np.where(starting, mode_heat, stored_heat)
+        stored_setpoint = np.where(starting, setpoint, stored_setpoint)
+        override_active = override_active | starting
+
+        # override setpoint (_compute_override_setpoint, _quantize_setpoint)
+        update = override_active & (starting | (increase != temperature_increase))
+        temperature_increase = np.where(update, increase, temperature_increase)
+        override_setpoint = np.minimum(quantize(controller_temperature, temperature_resolution) + increase, max_setpoint)
+        override_setpoint = np.maximum(override_setpoint, np.where(stored_heat, stored_setpoint, 0))
+        override_setpoint = quantize(override_setpoint, setpoint_step)
+        suppressed = (override_setpoint == setpoint) | (
+            (override_setpoint == last_sent_setpoint) & (t - last_sent_at < delay)
+        )
+        # heat mode and setpoint are sent in a single command when starting
+        send(update & (~suppressed | (starting & ~mode_heat)), True, override_setpoint, t)
+
+        # boiler and valves, both with a thermostatic band
+        demand = mode_heat & (controller_temperature < setpoint - boiler_band / 2)
+        satisfied = ~mode_heat | (controller_temperature >= setpoint + boiler_band / 2)
+        new_firing = np.where(firing, ~satisfied, demand)
+        boiler_starts += new_firing & ~firing
+        firing = new_firing
+        valve_open = np.where(
+            valve_open,
+            zone_temperature < zone_setpoints + house.zone_valve_band / 2,
+            zone_temperature < zone_setpoints - house.zone_valve_band / 2,
+        )
+
+        # first-order response towards the equilibrium temperature
+        outside = house.outside_temperature(t)
+        zone_equilibrium = outside + house.zone_gain * (firing[:, None] & valve_open)
+        zone_temperature = zone_equilibrium + (zone_temperature - zone_equilibrium) * np.exp(-step / house.zone_tau)
+        controller_equilibrium = outside + house.controller_gain * firing
+        controller_temperature = controller_equilibrium + (
+            controller_temperature - controller_equilibrium
+        ) * math.exp(-step / house.controller_tau)
+
+        # comfort
+        arrived_at_setpoint = ~np.isnan(waiting_since) & (zone_temperature >= zone_setpoints)
+        time_to_setpoint_sum += np.where(arrived_at_setpoint, t + step - waiting_since, 0).sum(axis=1)
+        time_to_setpoint_count += arrived_at_setpoint.sum(axis=1)
+        waiting_since[arrived_at_setpoint] = np.nan
+        reached |= arrived_at_setpoint
+        overshoot = np.where(reached, np.maximum(zone_temperature - zone_setpoints, 0), 0)
+        overshoot_max = np.maximum(overshoot_max, overshoot.max(axis=1))
+        overshoot_sum += overshoot.sum(axis=1)
+        overshoot_samples += reached.sum(axis=1)
+        underheating += np.maximum(zone_setpoints - zone_temperature, 0).sum(axis=1) * step / 3600
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "boiler_starts": boiler_starts,
+            "overshoot_max": overshoot_max,
+            "overshoot_mean": overshoot_sum / overshoot_samples,
+            "time_to_setpoint_s": time_to_setpoint_sum / time_to_setpoint_count,
+            "underheating_kh": underheating,
+            "controller_commands": commands,
+        }
+
+
+def parse_values(values: list):
+    """parse a list of numbers and inclusive start:stop:step ranges"""
+    result = []
+    for value in values:
+        if ":" in value:
+            start, stop, step = (float(part) for part in value.split(":"))
+            result.extend(np.round(np.arange(start, stop + step / 2, step), 4).tolist())
+        else:
+            result.append(float(value))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for name, default in PARAMETERS.items():
+        parser.add_argument(
+            "--" + name.replace("_", "-"), nargs="+", default=[str(value) for value in default],
+            metavar="VALUE", help="values or start:stop:step ranges, default {}".format(default[0]),
+        )
+    parser.add_argument("--zones", type=int, default=6)
+    parser.add_argument("--days", type=float, default=1, help="simulated duration")
+    parser.add_argument("--step", type=float, default=30, help="time step of the simulation, in seconds")
+    parser.add_argument("--controller-setpoint", type=float, default=15, help="setpoint of the controller without override")
+    parser.add_argument("--controller-off", action="store_true", help="the controller is off without override")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sort", choices=METRICS, default="boiler_starts")
+    parser.add_argument("--top", type=int, default=20, help="number of combinations to print, 0 for all")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    if np is None:
+        parser.exit(1, "The simulation requires numpy: pip install numpy\n")
+
+    grid = parameter_grid({
+        name: parse_values(getattr(args, name))
+        for name in PARAMETERS
+    })
+    started = time.perf_counter()
+    metrics = simulate(
+        grid,
+        House(args.zones, args.seed),
+        duration=args.days * 86400,
+        step=args.step,
+        controller_setpoint=args.controller_setpoint,
+        controller_heat=not args.controller_off,
+    )
+    elapsed = time.perf_counter() - started
+
+    order = np.argsort(metrics[args.sort], kind="stable")
+    if args.top:
+        order = order[:args.top]
+    results = [
+        {
+            **{name: float(grid[name][index]) for name in PARAMETERS},
+            **{name: round(float(metrics[name][index]), 3) for name in METRICS},
+        }
+        for index in order
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    columns = list(PARAMETERS) + METRICS
+    print("{} combinations simulated in {:.2f}s".format(len(next(iter(grid.values()))), elapsed))
+    print(" ".join(name.rjust(max(len(name), 8)) for name in columns))
+    for result in results:
+        print(" ".join(str(result[name]).rjust(max(len(name), 8)) for name in columns))
+
+
+if __name__ == "__main__":
+    main()
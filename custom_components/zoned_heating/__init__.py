@@ -1,17 +1,25 @@
 """The zoned_heating component."""
 import logging
 
-from homeassistant.config_entries import ConfigEntry
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
 from homeassistant.core import HomeAssistant
 from homeassistant.const import Platform
 
 from . import const
+from .util import get_entry_options
+from .storage import async_remove_store
+from .switch import create_switch
+from .services import async_setup_services
+from .profiler import get_profile_session
 
 _LOGGER = logging.getLogger(__name__)
 
+PLATFORMS = [Platform.SWITCH, Platform.SENSOR, Platform.BINARY_SENSOR]
+
 
 async def async_setup(hass, config):
     """Track states and offer events for sensors."""
+    async_setup_services(hass)
     return True
 
 
@@ -21,27 +29,47 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     # _async_import_options_from_data_if_missing(hass, entry)
 
     hass.data.setdefault(const.DOMAIN, {})
-    hass.data[const.DOMAIN][entry.entry_id] = {}
+    hass.data[const.DOMAIN][entry.entry_id] = {
+        # the switch is shared with the sensor platforms, which report its state
+        const.DATA_ENTITY: create_switch(hass, get_entry_options(entry), entry.entry_id),
+    }
 
     # Set up all platforms for this device/entry.
-    await hass.config_entries.async_forward_entry_setups(entry, [Platform.SWITCH])
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    # Reload entry when its updated.
-    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    # Apply changed options, or reload the entry when that is not possible.
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
 
     return True
 
 
-async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Reload the config entry when it changed."""
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply the options to the running entity, or reload the config entry when it cannot be updated in place."""
+    entity = hass.data[const.DOMAIN].get(entry.entry_id, {}).get(const.DATA_ENTITY)
+    if entity is not None and await entity.async_apply_options(get_entry_options(entry)):
+        return
     await hass.config_entries.async_reload(entry.entry_id)
 
 
 async def async_unload_entry(hass, entry):
     """Unload Zoned Heating config entry."""
-    unload_ok = await hass.config_entries.async_unload_platforms(entry, [Platform.SWITCH])
+    # a running profile would keep measuring, and hold the router, after the last entry is gone
+    session = get_profile_session(hass)
+    loaded = [
+        other for other in hass.config_entries.async_entries(const.DOMAIN)
+        if other.entry_id != entry.entry_id and other.state is ConfigEntryState.LOADED
+    ]
+    if session and not loaded:
+        await session.async_stop()
+
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
     if unload_ok:
         hass.data[const.DOMAIN].pop(entry.entry_id)
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored runtime state of a deleted config entry."""
+    await async_remove_store(hass, entry.entry_id)
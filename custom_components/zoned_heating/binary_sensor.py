@@ -0,0 +1,35 @@
+"""Binary sensor with the override state of zoned heating."""
+from homeassistant import config_entries
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.components.binary_sensor import BinarySensorEntity
+
+from . import const
+from .entity import ZonedHeatingSwitchEntity
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: config_entries.ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up the binary sensor of the zoned heating switch."""
+    switch = hass.data[const.DOMAIN][config_entry.entry_id][const.DATA_ENTITY]
+    async_add_entities([
+        OverrideActiveSensor(switch, config_entry.entry_id),
+    ])
+
+
+class OverrideActiveSensor(ZonedHeatingSwitchEntity, BinarySensorEntity):
+    """Whether the controller is overridden by the zones."""
+
+    key = const.ATTR_OVERRIDE_ACTIVE
+    name_suffix = "override"
+    _attr_icon = "mdi:fire"
+
+    def current_value(self):
+        return self._switch.override_active
+
+    @property
+    def is_on(self):
+        return self._value
@@ -0,0 +1,98 @@
+"""Capabilities of the controller entity."""
+from typing import NamedTuple, Optional
+
+from homeassistant.const import (
+    ATTR_SUPPORTED_FEATURES,
+    Platform,
+)
+from homeassistant.components.climate.const import (
+    ATTR_HVAC_MODES,
+    ATTR_MAX_TEMP,
+    ATTR_MIN_TEMP,
+    ATTR_TARGET_TEMP_STEP,
+    HVACMode,
+)
+
+from .util import (
+    as_float,
+    compute_domain,
+    supports_hvac_mode_with_temperature,
+)
+
+DEFAULT_TARGET_TEMP_STEP = 0.5
+
+# attributes of the controller which determine its profile
+PROFILE_ATTRIBUTES = (
+    ATTR_TARGET_TEMP_STEP,
+    ATTR_MIN_TEMP,
+    ATTR_MAX_TEMP,
+    ATTR_SUPPORTED_FEATURES,
+    ATTR_HVAC_MODES,
+)
+
+
+class ControllerProfile(NamedTuple):
+    """What the controller supports, derived from its entity id and attributes."""
+
+    domain: str
+    target_temp_step: float
+    min_temp: Optional[float]
+    max_temp: Optional[float]
+    supports_heat_with_temperature: bool
+
+    @property
+    def is_climate(self):
+        return self.domain == Platform.CLIMATE
+
+    @property
+    def is_switch(self):
+        return self.domain == Platform.SWITCH
+
+    def quantize(self, setpoint: float):
+        """round the setpoint to the step of the controller"""
+        return round(round(setpoint / self.target_temp_step) * self.target_temp_step, 4)
+
+    def clamp(self, setpoint: float):
+        """limit the setpoint to the range accepted by the controller"""
+        if self.max_temp is not None:
+            setpoint = min(setpoint, self.max_temp)
+        if self.min_temp is not None:
+            setpoint = max(setpoint, self.min_temp)
+        return setpoint
+
+
+def build_controller_profile(domain: str, state):
+    """return the profile of a controller with the given domain and state"""
+    attributes = state.attributes if state else {}
+    return ControllerProfile(
+        domain,
+        as_float(attributes.get(ATTR_TARGET_TEMP_STEP)) or DEFAULT_TARGET_TEMP_STEP,
+        as_float(attributes.get(ATTR_MIN_TEMP)),
+        as_float(attributes.get(ATTR_MAX_TEMP)),
+        domain == Platform.CLIMATE and supports_hvac_mode_with_temperature(state, HVACMode.HEAT),
+    )
+
+
+class ControllerProfileCache:
+    """Keeps the profile of a controller until one of its profile attributes changes."""
+
+    def __init__(self, entity_id: str):
+        self.domain = compute_domain(entity_id)
+        self._state = None
+        self._key = None
+        self._profile = None
+        self.builds = 0
+
+    def get(self, state) -> ControllerProfile:
+        """return the profile for the current state of the controller"""
+        if self._profile is not None and state is self._state:
+            return self._profile
+
+        attributes = state.attributes if state else {}
+        key = tuple(attributes.get(attribute) for attribute in PROFILE_ATTRIBUTES)
+        if self._profile is None or key != self._key:
+            self._profile = build_controller_profile(self.domain, state)
+            self._key = key
+            self.builds += 1
+        self._state = state
+        return self._profile
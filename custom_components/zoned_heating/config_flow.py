@@ -57,6 +57,16 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
         self.zones = None
         self.max_setpoint = None
         self.controller_delay_time = None
+        self.stop_threshold = None
+        self.min_on_time = None
+        self.min_off_time = None
+        self.controller_rate_limit = None
+        self.controller_burst = None
+        self.command_dispatch = None
+        self.coalesce_window = None
+        self.measurement_filter = None
+        self.coalesce_max_latency = None
+        self.startup = None
 
     async def async_step_init(self, user_input=None):
         """Handle options flow."""
@@ -159,10 +169,13 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
         )
 
     async def async_step_hysteresis(self, user_input=None):
-        """Handle hysteresis option during the options flow."""
+        """Handle the hysteresis, stop threshold and minimum on/off time during the options flow."""
 
         if user_input is not None:
             self.hysteresis = user_input.get(const.CONF_HYSTERESIS)
+            self.stop_threshold = min(user_input.get(const.CONF_STOP_THRESHOLD), self.hysteresis)
+            self.min_on_time = user_input.get(const.CONF_MIN_ON_TIME)
+            self.min_off_time = user_input.get(const.CONF_MIN_OFF_TIME)
             return await self.async_step_controller_delay_time()
 
         default = self.options.get(const.CONF_HYSTERESIS, const.DEFAULT_HYSTERESIS)
@@ -177,24 +190,40 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                     ): vol.All(
                         vol.Coerce(float),
                         vol.Range(min=0, max=10)
-                    )
+                    ),
+                    vol.Required(
+                        const.CONF_STOP_THRESHOLD,
+                        default=self.options.get(const.CONF_STOP_THRESHOLD, default)
+                    ): vol.All(
+                        vol.Coerce(float),
+                        vol.Range(min=-5, max=10)
+                    ),
+                    vol.Required(
+                        const.CONF_MIN_ON_TIME,
+                        default=self.options.get(const.CONF_MIN_ON_TIME, const.DEFAULT_MIN_ON_TIME)
+                    ): vol.All(
+                        vol.Coerce(int),
+                        vol.Range(min=0, max=3600)
+                    ),
+                    vol.Required(
+                        const.CONF_MIN_OFF_TIME,
+                        default=self.options.get(const.CONF_MIN_OFF_TIME, const.DEFAULT_MIN_OFF_TIME)
+                    ): vol.All(
+                        vol.Coerce(int),
+                        vol.Range(min=0, max=3600)
+                    ),
                 }
             )
         )
 
     async def async_step_controller_delay_time(self, user_input=None):
-        """Handle options flow."""
+        """Handle the controller delay time, rate limit and burst during the options flow."""
 
         if user_input is not None:
             self.controller_delay_time = user_input.get(const.CONF_CONTROLLER_DELAY_TIME)
-
-            return self.async_create_entry(title="", data={
-                const.CONF_ZONES: self.zones,
-                const.CONF_CONTROLLER: self.controller,
-                const.CONF_MAX_SETPOINT: self.max_setpoint,
-                const.CONF_CONTROLLER_DELAY_TIME: self.controller_delay_time,
-                const.CONF_HYSTERESIS: getattr(self, "hysteresis", const.DEFAULT_HYSTERESIS),
-            })
+            self.controller_rate_limit = user_input.get(const.CONF_CONTROLLER_RATE_LIMIT)
+            self.controller_burst = user_input.get(const.CONF_CONTROLLER_BURST)
+            return await self.async_step_command_dispatch()
 
         default = self.options.get(const.CONF_CONTROLLER_DELAY_TIME)
         if not default:
@@ -210,7 +239,194 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                     ): vol.All(
                         vol.Coerce(int),
                         vol.Range(min=10, max=300)
-                    )
+                    ),
+                    vol.Required(
+                        const.CONF_CONTROLLER_RATE_LIMIT,
+                        default=self.options.get(const.CONF_CONTROLLER_RATE_LIMIT, const.DEFAULT_CONTROLLER_RATE_LIMIT)
+                    ): vol.All(
+                        vol.Coerce(float),
+                        vol.Range(min=0, max=60)
+                    ),
+                    vol.Required(
+                        const.CONF_CONTROLLER_BURST,
+                        default=self.options.get(const.CONF_CONTROLLER_BURST, const.DEFAULT_CONTROLLER_BURST)
+                    ): vol.All(
+                        vol.Coerce(int),
+                        vol.Range(min=1, max=20)
+                    ),
+                }
+            )
+        )
+
+    async def async_step_command_dispatch(self, user_input=None):
+        """Handle the timeout, retries and confirmation of controller commands during the options flow."""
+
+        if user_input is not None:
+            self.command_dispatch = user_input
+            return await self.async_step_coalesce_window()
+
+        return self.async_show_form(
+            step_id="command_dispatch",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        const.CONF_COMMAND_TIMEOUT,
+                        default=self.options.get(const.CONF_COMMAND_TIMEOUT, const.DEFAULT_COMMAND_TIMEOUT)
+                    ): vol.All(
+                        vol.Coerce(float),
+                        vol.Range(min=0, max=600)
+                    ),
+                    vol.Required(
+                        const.CONF_COMMAND_RETRIES,
+                        default=self.options.get(const.CONF_COMMAND_RETRIES, const.DEFAULT_COMMAND_RETRIES)
+                    ): vol.All(
+                        vol.Coerce(int),
+                        vol.Range(min=0, max=10)
+                    ),
+                    vol.Required(
+                        const.CONF_COMMAND_CONFIRM,
+                        default=self.options.get(const.CONF_COMMAND_CONFIRM, False)
+                    ): bool,
+                }
+            )
+        )
+
+    async def async_step_coalesce_window(self, user_input=None):
+        """Handle the coalescing window and maximum delay of zone changes during the options flow."""
+
+        if user_input is not None:
+            self.coalesce_window = user_input.get(const.CONF_COALESCE_WINDOW)
+            self.coalesce_max_latency = user_input.get(const.CONF_COALESCE_MAX_LATENCY)
+            return await self.async_step_measurement_filter()
+
+        return self.async_show_form(
+            step_id=const.CONF_COALESCE_WINDOW,
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        const.CONF_COALESCE_WINDOW,
+                        default=self.options.get(const.CONF_COALESCE_WINDOW, const.DEFAULT_COALESCE_WINDOW)
+                    ): vol.All(
+                        vol.Coerce(float),
+                        vol.Range(min=0, max=60)
+                    ),
+                    vol.Required(
+                        const.CONF_COALESCE_MAX_LATENCY,
+                        default=self.options.get(const.CONF_COALESCE_MAX_LATENCY, const.DEFAULT_COALESCE_MAX_LATENCY)
+                    ): vol.All(
+                        vol.Coerce(float),
+                        vol.Range(min=0, max=300)
+                    ),
+                }
+            )
+        )
+
+    async def async_step_measurement_filter(self, user_input=None):
+        """Handle the resolution, minimum change and smoothing of the measured zone temperatures during the options flow."""
+
+        if user_input is not None:
+            self.measurement_filter = user_input
+            return await self.async_step_startup()
+
+        return self.async_show_form(
+            step_id="measurement_filter",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        const.CONF_TEMPERATURE_RESOLUTION,
+                        default=self.options.get(const.CONF_TEMPERATURE_RESOLUTION, const.DEFAULT_TEMPERATURE_RESOLUTION)
+                    ): vol.All(
+                        vol.Coerce(float),
+                        vol.Range(min=0, max=1)
+                    ),
+                    vol.Required(
+                        const.CONF_TEMPERATURE_MIN_DELTA,
+                        default=self.options.get(const.CONF_TEMPERATURE_MIN_DELTA, const.DEFAULT_TEMPERATURE_MIN_DELTA)
+                    ): vol.All(
+                        vol.Coerce(float),
+                        vol.Range(min=0, max=2)
+                    ),
+                    vol.Required(
+                        const.CONF_TEMPERATURE_SMOOTHING,
+                        default=self.options.get(const.CONF_TEMPERATURE_SMOOTHING, const.DEFAULT_TEMPERATURE_SMOOTHING)
+                    ): vol.All(
+                        vol.Coerce(float),
+                        vol.Range(min=0.01, max=1)
+                    ),
+                }
+            )
+        )
+
+    async def async_step_startup(self, user_input=None):
+        """Handle the zone fraction and timeout awaited after a restart during the options flow."""
+
+        if user_input is not None:
+            self.startup = user_input
+            return await self.async_step_event_log()
+
+        return self.async_show_form(
+            step_id="startup",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        const.CONF_STARTUP_ZONE_FRACTION,
+                        default=self.options.get(const.CONF_STARTUP_ZONE_FRACTION, const.DEFAULT_STARTUP_ZONE_FRACTION)
+                    ): vol.All(
+                        vol.Coerce(float),
+                        vol.Range(min=0, max=1)
+                    ),
+                    vol.Required(
+                        const.CONF_STARTUP_TIMEOUT,
+                        default=self.options.get(const.CONF_STARTUP_TIMEOUT, const.DEFAULT_STARTUP_TIMEOUT)
+                    ): vol.All(
+                        vol.Coerce(float),
+                        vol.Range(min=0, max=3600)
+                    ),
+                }
+            )
+        )
+
+    async def async_step_event_log(self, user_input=None):
+        """Handle the event log and metric sensors options during the options flow."""
+
+        if user_input is not None:
+            return self.async_create_entry(title="", data={
+                const.CONF_ZONES: self.zones,
+                const.CONF_CONTROLLER: self.controller,
+                const.CONF_MAX_SETPOINT: self.max_setpoint,
+                const.CONF_CONTROLLER_DELAY_TIME: self.controller_delay_time,
+                const.CONF_CONTROLLER_RATE_LIMIT: self.controller_rate_limit,
+                const.CONF_CONTROLLER_BURST: self.controller_burst,
+                const.CONF_COMMAND_TIMEOUT: self.command_dispatch.get(const.CONF_COMMAND_TIMEOUT),
+                const.CONF_COMMAND_RETRIES: self.command_dispatch.get(const.CONF_COMMAND_RETRIES),
+                const.CONF_COMMAND_CONFIRM: self.command_dispatch.get(const.CONF_COMMAND_CONFIRM),
+                const.CONF_HYSTERESIS: getattr(self, "hysteresis", const.DEFAULT_HYSTERESIS),
+                const.CONF_STOP_THRESHOLD: self.stop_threshold,
+                const.CONF_MIN_ON_TIME: self.min_on_time,
+                const.CONF_MIN_OFF_TIME: self.min_off_time,
+                const.CONF_COALESCE_WINDOW: self.coalesce_window,
+                const.CONF_COALESCE_MAX_LATENCY: max(self.coalesce_max_latency, self.coalesce_window),
+                const.CONF_TEMPERATURE_RESOLUTION: self.measurement_filter.get(const.CONF_TEMPERATURE_RESOLUTION),
+                const.CONF_TEMPERATURE_MIN_DELTA: self.measurement_filter.get(const.CONF_TEMPERATURE_MIN_DELTA),
+                const.CONF_TEMPERATURE_SMOOTHING: self.measurement_filter.get(const.CONF_TEMPERATURE_SMOOTHING),
+                const.CONF_STARTUP_ZONE_FRACTION: self.startup.get(const.CONF_STARTUP_ZONE_FRACTION),
+                const.CONF_STARTUP_TIMEOUT: self.startup.get(const.CONF_STARTUP_TIMEOUT),
+                const.CONF_EVENT_LOG: user_input.get(const.CONF_EVENT_LOG),
+                const.CONF_METRIC_SENSORS: user_input.get(const.CONF_METRIC_SENSORS),
+            })
+
+        return self.async_show_form(
+            step_id=const.CONF_EVENT_LOG,
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        const.CONF_EVENT_LOG,
+                        default=self.options.get(const.CONF_EVENT_LOG, False)
+                    ): bool,
+                    vol.Required(
+                        const.CONF_METRIC_SENSORS,
+                        default=self.options.get(const.CONF_METRIC_SENSORS, False)
+                    ): bool,
                 }
             )
         )
@@ -5,6 +5,10 @@ DOMAIN = "zoned_heating"
 NAME = "Zoned Heating"
 DATA = "data"
 UPDATE_LISTENER = "update_listener"
+DATA_COMMAND_QUEUES = "command_queues"
+DATA_EVENT_ROUTER = "event_router"
+DATA_ENTITY = "entity"
+DATA_PROFILE_SESSION = "profile_session"
 
 CONF_CONTROLLER = "controller"
 CONF_ZONES = "zones"
@@ -15,8 +19,44 @@ DEFAULT_MAX_SETPOINT = 21
 DEFAULT_CONTROLLER_DELAY_TIME = 10
 DEFAULT_HYSTERESIS = 1
 CONF_HYSTERESIS = "hysteresis"
+CONF_STOP_THRESHOLD = "stop_threshold"
+CONF_MIN_ON_TIME = "min_on_time"
+CONF_MIN_OFF_TIME = "min_off_time"
+DEFAULT_STOP_THRESHOLD = None  # stop at the hysteresis
+DEFAULT_MIN_ON_TIME = 0
+DEFAULT_MIN_OFF_TIME = 0
+CONF_COALESCE_WINDOW = "coalesce_window"
+CONF_COALESCE_MAX_LATENCY = "coalesce_max_latency"
+DEFAULT_COALESCE_WINDOW = 0
+DEFAULT_COALESCE_MAX_LATENCY = 10
+CONF_TEMPERATURE_RESOLUTION = "temperature_resolution"
+CONF_TEMPERATURE_MIN_DELTA = "temperature_min_delta"
+CONF_TEMPERATURE_SMOOTHING = "temperature_smoothing"
+DEFAULT_TEMPERATURE_RESOLUTION = 0
+DEFAULT_TEMPERATURE_MIN_DELTA = 0
+DEFAULT_TEMPERATURE_SMOOTHING = 1
+CONF_CONTROLLER_RATE_LIMIT = "controller_rate_limit"
+CONF_CONTROLLER_BURST = "controller_burst"
+DEFAULT_CONTROLLER_RATE_LIMIT = 0
+DEFAULT_CONTROLLER_BURST = 3
+CONF_COMMAND_TIMEOUT = "command_timeout"
+CONF_COMMAND_RETRIES = "command_retries"
+CONF_COMMAND_CONFIRM = "command_confirm"
+DEFAULT_COMMAND_TIMEOUT = 30
+DEFAULT_COMMAND_RETRIES = 2
+CONF_EVENT_LOG = "event_log"
+CONF_METRIC_SENSORS = "metric_sensors"
+CONF_STARTUP_ZONE_FRACTION = "startup_zone_fraction"
+CONF_STARTUP_TIMEOUT = "startup_timeout"
+DEFAULT_STARTUP_ZONE_FRACTION = 1
+DEFAULT_STARTUP_TIMEOUT = 300
 
 ATTR_OVERRIDE_ACTIVE = "override_active"
 ATTR_TEMPERATURE_INCREASE = "temperature_increase"
 ATTR_STORED_CONTROLLER_STATE = "stored_controller_state"
 ATTR_STORED_CONTROLLER_SETPOINT = "stored_controller_setpoint"
+ATTR_DOMINANT_ZONE = "dominant_zone"
+ATTR_MEASUREMENT_FILTER = "measurement_filter"
+ATTR_CONTROLLER_COMMANDS = "controller_commands"
+ATTR_ENABLED = "enabled"
+ATTR_ZONE_DEMAND = "zone_demand"
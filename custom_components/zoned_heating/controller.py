@@ -0,0 +1,423 @@
+"""Interaction with the controller entity."""
+import asyncio
+import datetime
+import logging
+import time
+from collections import OrderedDict, deque
+import homeassistant.util.dt as dt_util
+
+from homeassistant.const import ATTR_TEMPERATURE
+from homeassistant.core import (
+    Context,
+    HomeAssistant,
+    callback,
+)
+from homeassistant.helpers.event import (
+    async_track_point_in_time,
+    async_track_state_change_event,
+)
+from homeassistant.components.climate.const import ATTR_HVAC_MODE
+
+from . import const
+from .metrics import Metrics
+from .util import (
+    async_wait_for,
+    async_set_hvac_mode,
+    async_set_temperature,
+    async_set_hvac_mode_and_temperature,
+    async_set_switch_state,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+COMMAND_STATE = "state"
+COMMAND_TEMPERATURE = "temperature"
+COMMAND_STATE_TEMPERATURE = "state_temperature"
+
+# attributes of the controller state which are written by a command
+WRITES = {
+    COMMAND_STATE: (ATTR_HVAC_MODE,),
+    COMMAND_TEMPERATURE: (ATTR_TEMPERATURE,),
+    COMMAND_STATE_TEMPERATURE: (ATTR_HVAC_MODE, ATTR_TEMPERATURE),
+}
+
+# queued commands which are made obsolete by a newer command
+SUPERSEDES = {
+    COMMAND_STATE: (COMMAND_STATE,),
+    COMMAND_TEMPERATURE: (COMMAND_TEMPERATURE,),
+    COMMAND_STATE_TEMPERATURE: (COMMAND_STATE, COMMAND_TEMPERATURE, COMMAND_STATE_TEMPERATURE),
+}
+
+# seconds to wait before the first retry of a failed command, doubled for every next retry
+RETRY_BACKOFF = 2
+MAX_RETRY_BACKOFF = 60
+
+
+def get_command_queue(hass: HomeAssistant, entity_id: str):
+    """return the command queue of a controller, shared by all zoned heating entries using it"""
+    queues = hass.data.setdefault(const.DOMAIN, {}).setdefault(const.DATA_COMMAND_QUEUES, {})
+    if entity_id not in queues:
+        queues[entity_id] = ControllerCommandQueue(hass, entity_id)
+    return queues[entity_id]
+
+
+class ControllerCommandQueue:
+    """Single writer for a controller entity.
+
+    Commands are sent one at a time. A queued command that has not been sent yet
+    is dropped when a newer command of the same kind arrives, so only the final
+    desired state of the controller is written.
+
+    Every command is sent with its own context, such that the resulting state
+    changes of the controller can be told apart from changes made by the user.
+
+    Optionally, the commands are rate limited by a token bucket. While waiting
+    for a token, queued commands can still be superseded.
+
+    A command which fails or does not finish within the timeout is retried
+    with an increasing delay, unless it is superseded in the meantime. In
+    confirm mode, the service call is not awaited; the command is finished once
+    the state of the controller shows the written values.
+
+    Each entry using the queue configures its own settings. Since the commands
+    of all entries are sent by the same queue, the most restrictive settings
+    apply: the lowest rate limit and burst, the shortest timeout, the fewest
+    retries, and confirm mode if any entry uses it.
+    """
+
+    def __init__(self, hass: HomeAssistant, entity_id: str):
+        self.hass = hass
+        self.entity_id = entity_id
+        self._pending = OrderedDict()
+        self._worker = None
+        # contexts of the last commands, a context is recognized however long its command takes
+        self._sent_contexts = deque(maxlen=16)
+        self._sent_values = {}
+        self._listeners = []
+        self._rate_limit = 0
+        self._burst = 1
+        self._tokens = 1
+        self._tokens_updated = None
+        self._timeout = 0
+        self._retries = 0
+        self._confirm = False
+        self._settings = {}
+        # whether the controller applies the hvac mode of a combined command, None until it is known
+        self.combined_supported = None
+        self.stats = {
+            "sent": 0,
+            "failed": 0,
+            "superseded": 0,
+            "suppressed": 0,
+            "deferred": 0,
+            "retried": 0,
+            "timed_out": 0,
+        }
+        self.metrics = Metrics()
+
+    def configure(self, owner, rate_limit: float, burst: int, timeout: float, retries: int, confirm: bool):
+        """set the settings of an entry using the queue, see set_rate_limit and set_dispatch"""
+        self._settings[owner] = (rate_limit or 0, max(int(burst or 1), 1), timeout or 0, max(int(retries or 0), 0), bool(confirm))
+        self._apply_settings()
+
+    def release(self, owner):
+        """remove the settings of an entry which no longer uses the queue"""
+        if self._settings.pop(owner, None) is not None:
+            self._apply_settings()
+
+    def _apply_settings(self):
+        """apply the most restrictive settings of all entries"""
+        settings = list(self._settings.values())
+        rate_limits = [rate_limit for rate_limit, *_ in settings if rate_limit]
+        timeouts = [timeout for _, _, timeout, _, _ in settings if timeout]
+        self.set_rate_limit(
+            min(rate_limits, default=0),
+            min((burst for _, burst, *_ in settings), default=1),
+        )
+        self.set_dispatch(
+            min(timeouts, default=0),
+            min((retries for *_, retries, _ in settings), default=0),
+            any(confirm for *_, confirm in settings),
+        )
+
+    def set_rate_limit(self, rate_limit: float, burst: int):
+        """limit the commands to rate_limit per minute (0 for no limit), allowing bursts of burst commands"""
+        self._rate_limit = rate_limit or 0
+        self._burst = max(int(burst or 1), 1)
+        self._tokens = min(self._tokens, self._burst) if self._tokens_updated else self._burst
+
+    def set_dispatch(self, timeout: float, retries: int, confirm: bool):
+        """give up on a command after timeout seconds (0 for no limit), retry a failed command retries times, confirm commands by the state instead of waiting for the service call"""
+        self._timeout = timeout or 0
+        self._retries = max(int(retries or 0), 0)
+        self._confirm = bool(confirm)
+
+    @callback
+    def async_add_listener(self, listener):
+        """call listener(kind, args, context) for every command that is sent, returns a function to remove it"""
+        self._listeners.append(listener)
+
+        def remove():
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+        return remove
+
+    def record_suppressed(self):
+        """count a command which was not queued since it would not change the controller"""
+        self.stats["suppressed"] += 1
+
+    async def async_set_hvac_mode(self, hvac_mode: str):
+        """queue an update of the hvac mode, returns False if it was superseded"""
+        return await self._async_enqueue(
+            COMMAND_STATE, async_set_hvac_mode, hvac_mode
+        )
+
+    async def async_set_switch_state(self, state: str):
+        """queue an update of the switch state, returns False if it was superseded"""
+        return await self._async_enqueue(
+            COMMAND_STATE, async_set_switch_state, state
+        )
+
+    async def async_set_temperature(self, temperature: float):
+        """queue an update of the setpoint, returns False if it was superseded"""
+        return await self._async_enqueue(
+            COMMAND_TEMPERATURE, async_set_temperature, temperature
+        )
+
+    async def async_set_hvac_mode_and_temperature(self, hvac_mode: str, temperature: float):
+        """queue a combined update of hvac mode and setpoint, returns False if it was superseded"""
+        return await self._async_enqueue(
+            COMMAND_STATE_TEMPERATURE, async_set_hvac_mode_and_temperature, hvac_mode, temperature
+        )
+
+    async def _async_enqueue(self, kind: str, handler, *args):
+        future = self.hass.loop.create_future()
+        for superseded_kind in SUPERSEDES[kind]:
+            if superseded_kind not in self._pending:
+                continue
+            _, superseded_args, superseded_future = self._pending.pop(superseded_kind)
+            _LOGGER.debug("Dropping %s=%s for %s, superseded by %s=%s", superseded_kind, superseded_args, self.entity_id, kind, args)
+            self.stats["superseded"] += 1
+            if not superseded_future.done():
+                superseded_future.set_result(False)
+        self._pending[kind] = (handler, args, future)
+
+        if self._worker is None or self._worker.done():
+            self._worker = self.hass.async_create_task(self._async_process())
+
+        return await future
+
+    async def _async_process(self):
+        """send the queued commands one by one"""
+        futures = []
+        error = None
+        try:
+            while self._pending:
+                delay = self._reserve_token()
+                if delay:
+                    _LOGGER.debug("Rate limit of %s reached, deferring commands by %.1fs", self.entity_id, delay)
+                    self.stats["deferred"] += 1
+                    await self._async_wait(delay)
+                    continue
+                kind, (handler, args, future) = self._pending.popitem(last=False)
+                if future.done():
+                    # the caller stopped waiting for it, e.g. since its commands were replaced
+                    _LOGGER.debug("Dropping %s=%s for %s, no longer awaited", kind, args, self.entity_id)
+                    self.stats["superseded"] += 1
+                    continue
+                futures = [future]
+                result = await self._async_send(kind, handler, args)
+                futures = []
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        except Exception as exc:
+            _LOGGER.exception("Unexpected error while sending commands to %s", self.entity_id)
+            error = exc
+        finally:
+            # the callers waiting for a command must not hang when the worker fails or is cancelled
+            futures += [future for _, _, future in self._pending.values()]
+            self._pending.clear()
+            for future in futures:
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.cancel()
+
+    async def _async_send(self, kind: str, handler, args):
+        """send a command, with retries, returns True when sent, False when superseded or the exception"""
+        attempt = 0
+        while True:
+            context = Context()
+            now = dt_util.utcnow()
+            self._sent_contexts.append(context.id)
+            for attr, value in zip(WRITES[kind], args):
+                self._sent_values[attr] = (value, now)
+            for listener in list(self._listeners):
+                try:
+                    listener(kind, args, context)
+                except Exception:
+                    _LOGGER.exception("Error in listener for commands to %s", self.entity_id)
+            self.metrics.increment("commands_" + kind)
+            started = time.perf_counter()
+            try:
+                await self._async_dispatch(kind, handler, args, context)
+            except Exception as exc:
+                if isinstance(exc, asyncio.TimeoutError):
+                    self.stats["timed_out"] += 1
+                    self.metrics.increment("timeouts_" + kind)
+                if self._is_superseded(kind):
+                    _LOGGER.debug("Command %s=%s for %s failed, superseded by a newer command: %s", kind, args, self.entity_id, exc)
+                    self.stats["superseded"] += 1
+                    return False
+                if attempt >= self._retries:
+                    _LOGGER.warning("Command %s=%s for %s failed: %s", kind, args, self.entity_id, str(exc) or type(exc).__name__)
+                    self.stats["failed"] += 1
+                    self.metrics.increment("failures_" + kind)
+                    # the values were not written, so they must not suppress the same command later
+                    for attr, value in zip(WRITES[kind], args):
+                        if self._sent_values.get(attr, (None,))[0] == value:
+                            self._sent_values.pop(attr)
+                    return exc
+            else:
+                self.stats["sent"] += 1
+                return True
+            finally:
+                self.metrics.observe("service_call_latency", time.perf_counter() - started)
+
+            delay = min(RETRY_BACKOFF * 2 ** attempt, MAX_RETRY_BACKOFF)
+            attempt += 1
+            _LOGGER.debug("Retrying %s=%s for %s in %ss (attempt %s of %s)", kind, args, self.entity_id, delay, attempt, self._retries)
+            self.stats["retried"] += 1
+            self.metrics.increment("retries_" + kind)
+            await self._async_wait(delay)
+            delay = self._reserve_token()
+            while delay and not self._is_superseded(kind):
+                await self._async_wait(delay)
+                delay = self._reserve_token()
+            if self._is_superseded(kind):
+                _LOGGER.debug("Dropping retry of %s=%s for %s, superseded by a newer command", kind, args, self.entity_id)
+                self.stats["superseded"] += 1
+                return False
+
+    async def _async_dispatch(self, kind: str, handler, args, context: Context):
+        """call the service of a command, and wait for the result or the confirming state within the timeout"""
+        if not self._confirm:
+            await async_wait_for(
+                self.hass,
+                handler(self.hass, self.entity_id, *args, context=context),
+                self._timeout,
+            )
+            return
+
+        await handler(self.hass, self.entity_id, *args, context=context, blocking=False)
+        # without a result of the service call, the confirmation cannot be awaited without limit
+        await async_wait_for(
+            self.hass,
+            self._async_confirmation(kind, args),
+            self._timeout or const.DEFAULT_COMMAND_TIMEOUT,
+        )
+
+    async def _async_confirmation(self, kind: str, args):
+        """wait until the state of the controller shows the values written by a command"""
+        if self._is_confirmed(kind, args):
+            return
+        confirmed = self.hass.loop.create_future()
+
+        @callback
+        def state_changed(event):
+            if not confirmed.done() and self._is_confirmed(kind, args):
+                confirmed.set_result(True)
+
+        remove_listener = async_track_state_change_event(self.hass, self.entity_id, state_changed)
+        try:
+            await confirmed
+        finally:
+            remove_listener()
+
+    async def async_confirm(self, kind: str, args, timeout: float):
+        """wait up to timeout seconds until the state of the controller shows the values of a command, returns whether it does"""
+        if self._is_confirmed(kind, args):
+            return True
+        if not timeout:
+            return False
+        try:
+            await async_wait_for(self.hass, self._async_confirmation(kind, args), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def _is_confirmed(self, kind: str, args):
+        """whether the state of the controller shows the values written by a command"""
+        state = self.hass.states.get(self.entity_id)
+        if state is None:
+            return False
+        for attr, value in zip(WRITES[kind], args):
+            # the hvac mode of a climate, and the on/off state of a switch, is the state of the entity
+            current = state.state if attr == ATTR_HVAC_MODE else state.attributes.get(attr)
+            if current != value:
+                return False
+        return True
+
+    def _is_superseded(self, kind: str):
+        """whether a newer command which supersedes a command of this kind is queued"""
+        return any(kind in SUPERSEDES[pending_kind] for pending_kind in self._pending)
+
+    def forget_sent(self, attr: str):
+        """forget the value written to attribute attr, after the controller was changed by the user"""
+        self._sent_values.pop(attr, None)
+
+    def _reserve_token(self):
+        """take a token from the bucket, returns the time to wait if none is available"""
+        if not self._rate_limit:
+            return 0
+        now = dt_util.utcnow()
+        if self._tokens_updated is not None:
+            self._tokens = min(
+                self._burst,
+                self._tokens + (now - self._tokens_updated).total_seconds() * self._rate_limit / 60,
+            )
+        self._tokens_updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) * 60 / self._rate_limit
+
+    async def _async_wait(self, delay: float):
+        """sleep for delay seconds"""
+        finished = self.hass.loop.create_future()
+
+        @callback
+        def timer_finished(now):
+            if not finished.done():
+                finished.set_result(None)
+
+        async_track_point_in_time(
+            self.hass, timer_finished, dt_util.utcnow() + datetime.timedelta(seconds=delay)
+        )
+        await finished
+
+    def is_own_context(self, context: Context):
+        """whether a state change was caused by one of the last commands"""
+        if context is None:
+            return False
+        return context.id in self._sent_contexts or context.parent_id in self._sent_contexts
+
+    def was_sent(self, attr: str, value, max_age: float):
+        """whether value was written to attribute attr within max_age seconds
+
+        Used for controllers which report the result of a command without its
+        context, e.g. when the state is polled from the device.
+        """
+        if attr not in self._sent_values:
+            return False
+        sent_value, sent_at = self._sent_values[attr]
+        return (
+            sent_value == value and
+            sent_at >= dt_util.utcnow() - datetime.timedelta(seconds=max_age)
+        )
@@ -0,0 +1,78 @@
+"""Bookkeeping of the heat demand of the zones."""
+import heapq
+
+from homeassistant.components.climate.const import HVACMode
+
+
+def compute_demand(state):
+    """temperature increase requested by a zone snapshot, None if the zone has no valid demand"""
+    # We deliberately ignore the `hvac_action` because some TRVs report
+    # `idle` even when in heat mode due to their internal hysteresis.
+    setpoint = state.temperature
+    current = state.current_temperature
+    if (
+        not isinstance(setpoint, (int, float)) or
+        not isinstance(current, (int, float)) or
+        state.hvac_mode == HVACMode.OFF
+    ):
+        return None
+    return float(setpoint) - float(current)
+
+
+class ZoneDemandIndex:
+    """Keeps the demand per zone, ordered such that the dominant zone is found in O(log n)."""
+
+    def __init__(self):
+        self._demand = {}
+        # max-heap of (-demand, entity_id), entries are invalidated lazily
+        self._heap = []
+
+    def __len__(self):
+        return len(self._demand)
+
+    def __contains__(self, entity_id):
+        return entity_id in self._demand
+
+    def get(self, entity_id):
+        """return the demand of a zone"""
+        return self._demand.get(entity_id)
+
+    def items(self):
+        """return (entity_id, demand) for all zones with a valid demand"""
+        return self._demand.items()
+
+    def update(self, entity_id: str, demand):
+        """set the demand of a zone, returns whether it changed"""
+        if demand is None:
+            return self.remove(entity_id)
+        if self._demand.get(entity_id) == demand:
+            return False
+        self._demand[entity_id] = demand
+        heapq.heappush(self._heap, (-demand, entity_id))
+        if len(self._heap) > 2 * len(self._demand) + 16:
+            self._compact()
+        return True
+
+    def remove(self, entity_id: str):
+        """drop a zone from the index, returns whether it was present"""
+        return self._demand.pop(entity_id, None) is not None
+
+    def clear(self):
+        """drop all zones"""
+        self._demand.clear()
+        self._heap.clear()
+
+    def dominant(self):
+        """return (entity_id, demand) of the zone with the highest demand, or (None, None)"""
+        heap = self._heap
+        while heap:
+            demand, entity_id = heap[0]
+            if self._demand.get(entity_id) == -demand:
+                return entity_id, -demand
+            heapq.heappop(heap)
+        return None, None
+
+    def _compact(self):
+        """rebuild the heap from the valid entries only"""
+        self._heap = [(-demand, entity_id) for entity_id, demand in self._demand.items()]
+        heapq.heapify(self._heap)
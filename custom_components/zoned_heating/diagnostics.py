@@ -0,0 +1,15 @@
+"""Diagnostics of a zoned heating config entry."""
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from . import const
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Return the options and the runtime state of a config entry."""
+    entity = hass.data.get(const.DOMAIN, {}).get(entry.entry_id, {}).get(const.DATA_ENTITY)
+    return {
+        "options": dict(entry.options),
+        "data": dict(entry.data),
+        "switch": entity.diagnostics() if entity else None,
+    }
@@ -0,0 +1,47 @@
+"""Base for the entities which report the state of the zoned heating switch."""
+import abc
+
+from homeassistant.core import callback
+from homeassistant.const import EntityCategory
+from homeassistant.helpers.entity import Entity
+
+
+class ZonedHeatingSwitchEntity(Entity):
+    """Entity with a value taken from the zoned heating switch.
+
+    The state is only written when the value has changed, unless the entity
+    is polled.
+    """
+
+    _attr_should_poll = False
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    key = None
+    name_suffix = None
+
+    def __init__(self, switch, entry_id: str):
+        self._switch = switch
+        self._value = None
+        self._attr_unique_id = "{}_{}".format(entry_id, self.key)
+        self._attr_name = "Zoned Heating {}".format(self.name_suffix)
+
+    @abc.abstractmethod
+    def current_value(self):
+        """return the value of the switch reported by this entity"""
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self._value = self.current_value()
+        if not self.should_poll:
+            self.async_on_remove(self._switch.async_add_listener(self._async_switch_updated))
+
+    async def async_update(self):
+        """take the value of the switch, for polled entities"""
+        self._value = self.current_value()
+
+    @callback
+    def _async_switch_updated(self):
+        value = self.current_value()
+        if value == self._value:
+            return
+        self._value = value
+        self.async_write_ha_state()
@@ -0,0 +1,106 @@
+"""Append-only log of the events received and commands sent by zoned heating."""
+import datetime
+import json
+import logging
+import os
+import homeassistant.util.dt as dt_util
+
+from homeassistant.const import ATTR_TEMPERATURE
+from homeassistant.core import (
+    HomeAssistant,
+    callback,
+)
+from homeassistant.helpers.event import async_track_point_in_time
+from homeassistant.components.climate.const import (
+    ATTR_CURRENT_TEMPERATURE,
+    ATTR_HVAC_ACTION,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+RECORD_START = "start"
+RECORD_STATE = "state"
+RECORD_COMMAND = "command"
+RECORD_OPTIONS = "options"
+
+# attributes of a state which are written to the log
+LOGGED_ATTRIBUTES = (ATTR_TEMPERATURE, ATTR_CURRENT_TEMPERATURE, ATTR_HVAC_ACTION)
+
+FLUSH_INTERVAL = 10
+MAX_BUFFER_SIZE = 200
+
+
+def state_record(state, attributes=LOGGED_ATTRIBUTES):
+    """compact representation of a state: [state, {attribute: value}]"""
+    if state is None:
+        return None
+    if attributes is None:
+        return [state.state, dict(state.attributes)]
+    return [
+        state.state,
+        {key: state.attributes[key] for key in attributes if key in state.attributes},
+    ]
+
+
+def read_event_log(path: str):
+    """read the records of an event log, skipping lines which cannot be parsed"""
+    records = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+class EventLog:
+    """Writes records as JSON lines to a file.
+
+    Records are buffered in memory and written in the executor, when the buffer
+    is full or FLUSH_INTERVAL seconds after the first buffered record.
+    """
+
+    def __init__(self, hass: HomeAssistant, path: str):
+        self.hass = hass
+        self.path = path
+        self._buffer = []
+        self._flush_timer = None
+
+    @callback
+    def async_record(self, record_type: str, **data):
+        """add a record to the log"""
+        data["t"] = round(dt_util.utcnow().timestamp(), 3)
+        data["type"] = record_type
+        self._buffer.append(data)
+
+        if len(self._buffer) >= MAX_BUFFER_SIZE:
+            self.hass.async_create_task(self.async_flush())
+        elif not self._flush_timer:
+            @callback
+            def timer_finished(now):
+                self._flush_timer = None
+                self.hass.async_create_task(self.async_flush())
+
+            self._flush_timer = async_track_point_in_time(
+                self.hass, timer_finished, dt_util.utcnow() + datetime.timedelta(seconds=FLUSH_INTERVAL)
+            )
+
+    async def async_flush(self):
+        """write the buffered records to the file"""
+        if self._flush_timer:
+            self._flush_timer()
+            self._flush_timer = None
+        if not self._buffer:
+            return
+        lines = [json.dumps(record, separators=(",", ":"), default=str) for record in self._buffer]
+        self._buffer = []
+        try:
+            await self.hass.async_add_executor_job(self._write, lines)
+        except OSError as exc:
+            _LOGGER.warning("Failed to write event log %s: %s", self.path, exc)
+
+    def _write(self, lines):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
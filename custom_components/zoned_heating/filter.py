@@ -0,0 +1,90 @@
+"""Noise filter for the temperature measurements of the zones."""
+
+
+class MeasurementFilter:
+    """Filters the current temperature reported by each zone.
+
+    The measurement is smoothed (EWMA), rounded to the configured resolution and
+    only passed on when it differs at least min_delta from the last passed value.
+    """
+
+    def __init__(self, resolution: float = 0, min_delta: float = 0, smoothing: float = 1):
+        self.configure(resolution, min_delta, smoothing)
+        # per zone: [smoothed value, reported value]
+        self._values = {}
+
+    def configure(self, resolution: float = 0, min_delta: float = 0, smoothing: float = 1):
+        """change the settings, the state of the zones is kept"""
+        self._resolution = resolution or 0
+        self._min_delta = min_delta or 0
+        self._smoothing = min(max(smoothing if smoothing is not None else 1, 0.01), 1)
+
+    @property
+    def settings(self):
+        """return (resolution, min_delta, smoothing)"""
+        return self._resolution, self._min_delta, self._smoothing
+
+    def update(self, entity_id: str, value):
+        """feed a new measurement of a zone, returns the filtered value"""
+        values = self._filter(entity_id, value)
+        if values is None:
+            return None
+        self._values[entity_id] = values
+        return values[1]
+
+    def preview(self, entity_id: str, value):
+        """return the filtered value of a new measurement of a zone, without feeding it"""
+        values = self._filter(entity_id, value)
+        return values[1] if values else None
+
+    def current(self, entity_id: str, value):
+        """return the filtered value of a zone whose last measurement, value, was already fed"""
+        if not isinstance(value, (int, float)):
+            return None
+        reported = self.get(entity_id)
+        return reported if reported is not None else self.preview(entity_id, value)
+
+    def _filter(self, entity_id: str, value):
+        """return [smoothed value, reported value] after a new measurement, None if it is not a number"""
+        if not isinstance(value, (int, float)):
+            return None
+
+        previous = self._values.get(entity_id)
+        if previous is None:
+            smoothed = float(value)
+        else:
+            smoothed = self._smoothing * float(value) + (1 - self._smoothing) * previous[0]
+
+        reported = smoothed
+        if self._resolution:
+            reported = round(round(smoothed / self._resolution) * self._resolution, 4)
+
+        if previous is not None and abs(reported - previous[1]) < self._min_delta:
+            reported = previous[1]
+
+        return [smoothed, reported]
+
+    def get(self, entity_id: str):
+        """return the last filtered value of a zone"""
+        values = self._values.get(entity_id)
+        return values[1] if values else None
+
+    def remove(self, entity_id: str):
+        """forget the filter state of a zone"""
+        self._values.pop(entity_id, None)
+
+    def as_dict(self):
+        """return the filter state, for storage"""
+        return {entity_id: list(values) for entity_id, values in self._values.items()}
+
+    def restore(self, data):
+        """load a filter state which was returned by as_dict"""
+        if not isinstance(data, dict):
+            return
+        for entity_id, values in data.items():
+            if (
+                isinstance(values, (list, tuple)) and
+                len(values) == 2 and
+                all(isinstance(value, (int, float)) for value in values)
+            ):
+                self._values[entity_id] = [float(values[0]), float(values[1])]
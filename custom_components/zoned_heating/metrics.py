@@ -0,0 +1,82 @@
+"""Counters and timing histograms of the work done by zoned heating."""
+import bisect
+import collections
+
+# upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 30)
+
+
+class Histogram:
+    """Distribution of durations over fixed buckets."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q: float):
+        """upper bound of the bucket which contains quantile q, at most the maximum"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank and count:
+                return min(BUCKETS[index], self.max) if index < len(BUCKETS) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 6) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": round(self.max, 6),
+            "buckets": {
+                ("le_{}".format(bound) if index < len(BUCKETS) else "inf"): count
+                for index, (bound, count) in enumerate(zip(BUCKETS + (None,), self.counts))
+                if count
+            },
+        }
+
+
+class Metrics:
+    """Named counters and histograms."""
+
+    def __init__(self):
+        self.counters = collections.Counter()
+        self.histograms = {}
+
+    def increment(self, name: str, value: int = 1):
+        self.counters[name] += value
+
+    def observe(self, name: str, value: float):
+        """add a duration in seconds to a histogram"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def histogram(self, name: str):
+        return self.histograms.get(name) or Histogram()
+
+    def as_dict(self):
+        return {
+            "counters": dict(self.counters),
+            "histograms": {name: histogram.as_dict() for name, histogram in self.histograms.items()},
+        }
@@ -0,0 +1,105 @@
+"""Decision logic for starting and stopping the override of the controller."""
+import datetime
+import logging
+import homeassistant.util.dt as dt_util
+
+from homeassistant.core import (
+    HomeAssistant,
+    callback,
+)
+from homeassistant.helpers.event import async_track_point_in_time
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class OverrideStateMachine:
+    """Two-sided deadband with minimum on- and off-time for the override.
+
+    The override is started when the temperature increase exceeds the start
+    threshold, and stopped when it drops to the stop threshold or below.
+    A transition which would violate the minimum on- or off-time is postponed,
+    and re-evaluated by calling on_timer when the guard expires.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        on_timer,
+        start_threshold: float,
+        stop_threshold: float,
+        min_on_time: float = 0,
+        min_off_time: float = 0,
+    ):
+        self.hass = hass
+        self._on_timer = on_timer
+        self._last_transition = None
+        self._previous_transition = None
+        self._guard_timer = None
+        self.configure(start_threshold, stop_threshold, min_on_time, min_off_time)
+
+    def configure(self, start_threshold: float, stop_threshold: float, min_on_time: float = 0, min_off_time: float = 0):
+        """change the thresholds and guard times, takes effect at the next evaluation"""
+        self._start_threshold = start_threshold
+        self._stop_threshold = min(stop_threshold, start_threshold)
+        self._min_on_time = min_on_time or 0
+        self._min_off_time = min_off_time or 0
+
+    def evaluate(self, active: bool, temperature_increase, enabled: bool):
+        """return whether the override should be active"""
+        desired, release = self.decide(active, temperature_increase, enabled)
+        if release is not None:
+            _LOGGER.debug("Postponing override %s until %s", "stop" if active else "start", release)
+            self._start_guard_timer(release)
+            return active
+
+        self._cancel_guard_timer()
+        if desired != active:
+            self._previous_transition = self._last_transition
+            self._last_transition = dt_util.utcnow()
+        return desired
+
+    def revert(self):
+        """undo the last transition, when the controller could not be changed accordingly"""
+        self._last_transition = self._previous_transition
+
+    def decide(self, active: bool, temperature_increase, enabled: bool):
+        """return (whether the override should be active, time until which the transition is postponed), without side effects"""
+        if not enabled or temperature_increase is None:
+            desired = False
+        elif active:
+            desired = temperature_increase > self._stop_threshold
+        else:
+            desired = temperature_increase > self._start_threshold
+
+        if desired == active:
+            return active, None
+
+        # the minimum on-time is not applied when zoned heating is turned off
+        min_time = self._min_off_time if desired else self._min_on_time
+        if enabled and min_time and self._last_transition is not None:
+            release = self._last_transition + datetime.timedelta(seconds=min_time)
+            if dt_util.utcnow() < release:
+                return active, release
+
+        return desired, None
+
+    def cancel(self):
+        """stop the timers"""
+        self._cancel_guard_timer()
+
+    def _start_guard_timer(self, release: datetime.datetime):
+        self._cancel_guard_timer()
+
+        @callback
+        def timer_finished(now):
+            self._guard_timer = None
+            self._on_timer()
+
+        self._guard_timer = async_track_point_in_time(
+            self.hass, timer_finished, release
+        )
+
+    def _cancel_guard_timer(self):
+        if self._guard_timer:
+            self._guard_timer()
+        self._guard_timer = None
@@ -0,0 +1,161 @@
+"""On-demand profile of the event handling of zoned heating."""
+import cProfile
+import datetime
+import json
+import logging
+import os
+import pstats
+import homeassistant.util.dt as dt_util
+
+from homeassistant.core import (
+    HomeAssistant,
+    callback,
+)
+from homeassistant.helpers.event import async_track_point_in_time
+
+from . import const
+from .router import get_event_router
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_DURATION = 60
+MAX_PROFILE_DURATION = 3600
+
+# number of functions, by cumulative time, which are written to the summary
+MAX_FUNCTIONS = 50
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# functions of the package whose cumulative time is reported per phase, as (module, function)
+PHASES = {
+    "parse": (("util", "parse_state"), ("util", "has_relevant_change")),
+    "evaluate": (("switch", "_async_calculate_override"),),
+    "dispatch": (("controller", "_async_dispatch"), ("zones", "async_command_zones")),
+}
+
+
+def get_profile_session(hass: HomeAssistant):
+    """return the running profile session, if any"""
+    return hass.data.get(const.DOMAIN, {}).get(const.DATA_PROFILE_SESSION)
+
+
+def summarize_profile(stats: pstats.Stats):
+    """return the cumulative time per phase and of the functions which take most time"""
+    phase_functions = {
+        (module + ".py", name): phase
+        for phase, functions in PHASES.items()
+        for module, name in functions
+    }
+    phases = {phase: {"calls": 0, "time": 0.0} for phase in PHASES}
+    functions = []
+    for func, (primitive_calls, calls, total_time, cumulative_time, _callers) in stats.stats.items():
+        filename, _line, name = func
+        if os.path.dirname(os.path.abspath(filename)) == PACKAGE_DIR:
+            phase = phase_functions.get((os.path.basename(filename), name))
+            if phase:
+                phases[phase]["calls"] += calls
+                phases[phase]["time"] += cumulative_time
+        functions.append({
+            "function": pstats.func_std_string(func),
+            "calls": calls,
+            "primitive_calls": primitive_calls,
+            "total_time": round(total_time, 6),
+            "cumulative_time": round(cumulative_time, 6),
+        })
+    functions.sort(key=lambda function: function["cumulative_time"], reverse=True)
+    for phase in phases.values():
+        phase["time"] = round(phase["time"], 6)
+    return {"phases": phases, "functions": functions[:MAX_FUNCTIONS]}
+
+
+class ProfileSession:
+    """cProfile instrumentation of the event loop for a number of seconds or events.
+
+    The profiler runs on the thread of the event loop, such that the handlers
+    of all zoned heating switches (and anything else running meanwhile) are
+    measured. Events are counted for the given entities. When the session ends,
+    the raw stats are written to <path>.prof (readable with pstats or
+    snakeviz) and a summary with the time per phase to <path>.json.
+
+    The time of a coroutine is measured per resumption, so the number of
+    calls of a coroutine includes its resumptions after an await.
+    """
+
+    def __init__(self, hass: HomeAssistant, entity_ids, duration: float, events: int, path: str):
+        self.hass = hass
+        self.entity_ids = list(entity_ids)
+        self.duration = duration
+        self.max_events = events
+        self.path = path
+        self.events = 0
+        self.started = None
+        self._profile = cProfile.Profile()
+        self._timer = None
+        self._unsubscribe = None
+        self._stopping = False
+
+    @callback
+    def async_start(self):
+        """start profiling, raises ValueError when another profiler is active"""
+        self._profile.enable()
+        self.started = dt_util.utcnow()
+        self.hass.data.setdefault(const.DOMAIN, {})[const.DATA_PROFILE_SESSION] = self
+
+        @callback
+        def timer_finished(now):
+            self._timer = None
+            self.hass.async_create_task(self.async_stop())
+
+        self._timer = async_track_point_in_time(
+            self.hass, timer_finished, self.started + datetime.timedelta(seconds=self.duration)
+        )
+        if self.entity_ids:
+            self._unsubscribe = get_event_router(self.hass).async_subscribe(self.entity_ids, self._async_event)
+        _LOGGER.info(
+            "Profiling zoned heating for %s seconds or %s events, writing to %s",
+            self.duration, self.max_events, self.path,
+        )
+
+    @callback
+    def _async_event(self, event, old_snapshot, new_snapshot):
+        self.events += 1
+        if self.max_events and self.events >= self.max_events and not self._stopping:
+            self.hass.async_create_task(self.async_stop())
+
+    async def async_stop(self):
+        """stop profiling and write the stats"""
+        if self._stopping:
+            return
+        self._stopping = True
+        self._profile.disable()
+        finished = dt_util.utcnow()
+        if self._timer:
+            self._timer()
+            self._timer = None
+        if self._unsubscribe:
+            self._unsubscribe()
+            self._unsubscribe = None
+        data = self.hass.data.get(const.DOMAIN, {})
+        if data.get(const.DATA_PROFILE_SESSION) is self:
+            data.pop(const.DATA_PROFILE_SESSION)
+
+        header = {
+            "started": self.started.isoformat(),
+            "finished": finished.isoformat(),
+            "duration": round((finished - self.started).total_seconds(), 3),
+            "entities": self.entity_ids,
+            "events": self.events,
+        }
+        try:
+            await self.hass.async_add_executor_job(self._write, header)
+        except OSError as exc:
+            _LOGGER.warning("Failed to write profile %s: %s", self.path, exc)
+            return
+        _LOGGER.info("Profile of zoned heating written to %s.json", self.path)
+
+    def _write(self, header):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._profile.dump_stats(self.path + ".prof")
+        summary = {**header, **summarize_profile(pstats.Stats(self._profile))}
+        with open(self.path + ".json", "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=2)
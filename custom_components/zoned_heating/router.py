@@ -0,0 +1,102 @@
+"""Shared subscription to the state changes of controllers and zones."""
+import logging
+
+from homeassistant.core import (
+    HomeAssistant,
+    callback,
+)
+from homeassistant.helpers.event import async_track_state_change_event
+
+from . import const
+from .metrics import Metrics
+from .util import (
+    parse_state,
+    has_relevant_change,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def get_event_router(hass: HomeAssistant):
+    """return the event router, shared by all zoned heating entries"""
+    data = hass.data.setdefault(const.DOMAIN, {})
+    if const.DATA_EVENT_ROUTER not in data:
+        data[const.DATA_EVENT_ROUTER] = StateEventRouter(hass)
+    return data[const.DATA_EVENT_ROUTER]
+
+
+class StateEventRouter:
+    """Single state listener per entity for all zoned heating entries.
+
+    An entity which is used by several entries (e.g. a zone in multiple groups)
+    is tracked once. The states of an event are parsed once, and only handed
+    to the subscribers for which the change is relevant.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        self.hass = hass
+        # per entity: list of (attributes, action)
+        self._subscribers = {}
+        # per entity: function to remove the state listener
+        self._listeners = {}
+        self.metrics = Metrics()
+
+    @property
+    def entity_count(self):
+        """number of tracked entities"""
+        return len(self._listeners)
+
+    @callback
+    def async_subscribe(self, entity_ids, action, attributes=None):
+        """call action(event, old_snapshot, new_snapshot) when the state or one of the attributes of an entity changes
+
+        With attributes None, action is called for every state change.
+        Returns a function to unsubscribe.
+        """
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_ids]
+        entity_ids = list(entity_ids)
+        subscription = (tuple(attributes) if attributes is not None else None, action)
+
+        for entity_id in entity_ids:
+            self._subscribers.setdefault(entity_id, []).append(subscription)
+            if entity_id not in self._listeners:
+                self._listeners[entity_id] = async_track_state_change_event(
+                    self.hass, entity_id, self._async_state_changed
+                )
+
+        @callback
+        def async_unsubscribe():
+            for entity_id in entity_ids:
+                subscribers = self._subscribers.get(entity_id, [])
+                if subscription in subscribers:
+                    subscribers.remove(subscription)
+                if not subscribers and entity_id in self._listeners:
+                    self._subscribers.pop(entity_id, None)
+                    self._listeners.pop(entity_id)()
+
+        return async_unsubscribe
+
+    @callback
+    def _async_state_changed(self, event):
+        """fan out a state change to the subscribers for which it is relevant"""
+        subscribers = self._subscribers.get(event.data["entity_id"])
+        if not subscribers:
+            return
+
+        self.metrics.increment("events_received")
+        old_state = event.data["old_state"]
+        new_state = event.data["new_state"]
+        relevant = {}
+        snapshots = None
+        for attributes, action in list(subscribers):
+            if attributes is not None:
+                if attributes not in relevant:
+                    relevant[attributes] = has_relevant_change(old_state, new_state, attributes)
+                if not relevant[attributes]:
+                    self.metrics.increment("events_filtered")
+                    continue
+            if snapshots is None:
+                snapshots = (parse_state(old_state), parse_state(new_state))
+            self.metrics.increment("events_dispatched")
+            action(event, *snapshots)
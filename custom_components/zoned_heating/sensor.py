@@ -0,0 +1,194 @@
+"""Sensors with the dynamic state of zoned heating."""
+import datetime
+
+from homeassistant import config_entries
+from homeassistant.const import UnitOfTime
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
+
+from . import const
+from .entity import ZonedHeatingSwitchEntity
+
+# interval at which the metric sensors are updated, the other sensors are not polled
+SCAN_INTERVAL = datetime.timedelta(seconds=60)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: config_entries.ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up the sensors of the zoned heating switch."""
+    switch = hass.data[const.DOMAIN][config_entry.entry_id][const.DATA_ENTITY]
+    entities = [
+        TemperatureIncreaseSensor(switch, config_entry.entry_id),
+        DominantZoneSensor(switch, config_entry.entry_id),
+    ]
+    if switch.metric_sensors:
+        entities += [
+            EvaluationsSensor(switch, config_entry.entry_id),
+            EventsSensor(switch, config_entry.entry_id),
+            ControllerCommandsSensor(switch, config_entry.entry_id),
+            CommandLatencySensor(switch, config_entry.entry_id),
+        ]
+    async_add_entities(entities)
+
+
+def milliseconds(seconds):
+    """return a duration in seconds in milliseconds"""
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+class TemperatureIncreaseSensor(ZonedHeatingSwitchEntity, SensorEntity):
+    """Temperature increase requested by the dominant zone."""
+
+    key = const.ATTR_TEMPERATURE_INCREASE
+    name_suffix = "temperature increase"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:thermometer-chevron-up"
+
+    def current_value(self):
+        return self._switch.temperature_increase
+
+    @property
+    def native_value(self):
+        return self._value
+
+    @property
+    def native_unit_of_measurement(self):
+        # a temperature difference in the unit of the system, without the temperature device class
+        # such that it is not converted like a temperature (which would apply an offset)
+        return self.hass.config.units.temperature_unit
+
+
+class DominantZoneSensor(ZonedHeatingSwitchEntity, SensorEntity):
+    """Zone which operates the controller."""
+
+    key = const.ATTR_DOMINANT_ZONE
+    name_suffix = "dominant zone"
+    _attr_icon = "mdi:home-thermometer"
+
+    def current_value(self):
+        return self._switch.dominant_zone
+
+    @property
+    def native_value(self):
+        return self._value
+
+
+class MetricSensor(ZonedHeatingSwitchEntity, SensorEntity):
+    """Counter of the work done by the zoned heating switch, updated every SCAN_INTERVAL."""
+
+    _attr_should_poll = True
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_icon = "mdi:counter"
+
+    @property
+    def native_value(self):
+        return self._value
+
+    def metric_attributes(self):
+        """return the details of the metric"""
+        return {}
+
+    @property
+    def extra_state_attributes(self):
+        return self.metric_attributes()
+
+
+class EvaluationsSensor(MetricSensor):
+    """Number of evaluations of the override, and their duration."""
+
+    key = "evaluations"
+    name_suffix = "evaluations"
+    _unrecorded_attributes = frozenset({"scheduled", "mean_ms", "p95_ms", "max_ms"})
+
+    def current_value(self):
+        return self._switch.metrics.counters["evaluations"]
+
+    def metric_attributes(self):
+        metrics = self._switch.metrics
+        duration = metrics.histogram("evaluation_duration")
+        return {
+            "scheduled": metrics.counters["evaluations_scheduled"],
+            "mean_ms": milliseconds(duration.mean),
+            "p95_ms": milliseconds(duration.quantile(0.95)),
+            "max_ms": milliseconds(duration.max),
+        }
+
+
+class EventsSensor(MetricSensor):
+    """Number of state changes of the controller and zones handled by the switch."""
+
+    key = "events"
+    name_suffix = "events"
+    _unrecorded_attributes = frozenset({
+        "zone_events",
+        "controller_events",
+        "controller_events_skipped",
+        "echo_events_ignored",
+        "echo_setpoints_ignored",
+    })
+
+    def current_value(self):
+        counters = self._switch.metrics.counters
+        return counters["zone_events"] + counters["controller_events"]
+
+    def metric_attributes(self):
+        counters = self._switch.metrics.counters
+        return {name: counters[name] for name in sorted(self._unrecorded_attributes)}
+
+
+class ControllerCommandsSensor(MetricSensor):
+    """Number of commands sent to the controller, by all entries using it."""
+
+    key = const.ATTR_CONTROLLER_COMMANDS
+    name_suffix = "controller commands"
+    _attr_icon = "mdi:send"
+    _unrecorded_attributes = frozenset({"failed", "superseded", "suppressed", "deferred", "by_kind"})
+
+    def current_value(self):
+        commands = self._switch.controller_commands
+        return commands.stats["sent"] if commands else None
+
+    def metric_attributes(self):
+        commands = self._switch.controller_commands
+        if not commands:
+            return {}
+        return {
+            **{name: value for name, value in commands.stats.items() if name != "sent"},
+            "by_kind": dict(commands.metrics.counters),
+        }
+
+
+class CommandLatencySensor(MetricSensor):
+    """95th percentile of the duration of the service calls to the controller."""
+
+    key = "command_latency"
+    name_suffix = "controller command latency"
+    _attr_icon = "mdi:timer-outline"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _unrecorded_attributes = frozenset({"count", "mean_ms", "p50_ms", "max_ms"})
+
+    def current_value(self):
+        commands = self._switch.controller_commands
+        return milliseconds(commands.metrics.histogram("service_call_latency").quantile(0.95)) if commands else None
+
+    def metric_attributes(self):
+        commands = self._switch.controller_commands
+        if not commands:
+            return {}
+        latency = commands.metrics.histogram("service_call_latency")
+        return {
+            "count": latency.count,
+            "mean_ms": milliseconds(latency.mean),
+            "p50_ms": milliseconds(latency.quantile(0.5)),
+            "max_ms": milliseconds(latency.max),
+        }
@@ -0,0 +1,241 @@
+"""Services of the zoned heating integration."""
+import logging
+import voluptuous as vol
+import homeassistant.util.dt as dt_util
+
+from homeassistant.const import (
+    ATTR_ENTITY_ID,
+    ATTR_TEMPERATURE,
+)
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    SupportsResponse,
+)
+from homeassistant.exceptions import (
+    HomeAssistantError,
+    ServiceValidationError,
+)
+import homeassistant.helpers.config_validation as cv
+from homeassistant.components.climate.const import (
+    ATTR_CURRENT_TEMPERATURE,
+    ATTR_HVAC_MODE,
+    HVACMode,
+)
+
+from . import const
+from .profiler import (
+    DEFAULT_PROFILE_DURATION,
+    MAX_PROFILE_DURATION,
+    ProfileSession,
+    get_profile_session,
+)
+from .util import parse_state
+from .zones import async_command_zones
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_SET_ZONES = "set_zones"
+SERVICE_SYNC_ZONES = "sync_zones"
+SERVICE_EVALUATE = "evaluate"
+SERVICE_GET_TRACE = "get_trace"
+SERVICE_PROFILE = "profile"
+
+ATTR_SOURCE = "source"
+ATTR_DURATION = "duration"
+ATTR_EVENTS = "events"
+
+SET_ZONES_SCHEMA = vol.All(
+    cv.has_at_least_one_key(ATTR_HVAC_MODE, ATTR_TEMPERATURE),
+    vol.Schema({
+        vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Optional(const.CONF_ZONES): cv.entity_ids,
+        vol.Optional(ATTR_HVAC_MODE): vol.Coerce(HVACMode),
+        vol.Optional(ATTR_TEMPERATURE): vol.Coerce(float),
+    }),
+)
+
+SYNC_ZONES_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+    vol.Required(ATTR_SOURCE): cv.entity_id,
+    vol.Optional(const.CONF_ZONES): cv.entity_ids,
+})
+
+GET_TRACE_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+})
+
+PROFILE_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+    vol.Optional(ATTR_DURATION, default=DEFAULT_PROFILE_DURATION): vol.All(
+        vol.Coerce(float), vol.Range(min=1, max=MAX_PROFILE_DURATION)
+    ),
+    vol.Optional(ATTR_EVENTS): cv.positive_int,
+})
+
+EVALUATE_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+    # fields of the zone states which replace the current ones
+    vol.Optional(const.CONF_ZONES, default={}): vol.Schema({
+        cv.entity_id: vol.Schema({
+            vol.Optional(ATTR_HVAC_MODE): vol.Coerce(HVACMode),
+            vol.Optional(ATTR_TEMPERATURE): vol.Coerce(float),
+            vol.Optional(ATTR_CURRENT_TEMPERATURE): vol.Coerce(float),
+        }),
+    }),
+})
+
+
+def get_switches(hass: HomeAssistant, entity_ids=None):
+    """return the zoned heating switches with the given entity ids, or all of them"""
+    switches = [
+        data[const.DATA_ENTITY]
+        for data in hass.data.get(const.DOMAIN, {}).values()
+        if isinstance(data, dict) and const.DATA_ENTITY in data
+    ]
+    if entity_ids is None:
+        return switches
+    found = [switch for switch in switches if switch.entity_id in entity_ids]
+    unknown = set(entity_ids) - {switch.entity_id for switch in found}
+    if unknown:
+        raise ServiceValidationError("Not a zoned heating switch: {}".format(", ".join(sorted(unknown))))
+    return found
+
+
+def resolve_zones(switches, zones=None):
+    """return the requested zones, which must belong to one of the switches, or all of their zones"""
+    available = []
+    for switch in switches:
+        available += [zone for zone in switch.zone_entities if zone not in available]
+    if zones is None:
+        return available
+    unknown = [zone for zone in zones if zone not in available]
+    if unknown:
+        raise ServiceValidationError("Not a zone of zoned heating: {}".format(", ".join(unknown)))
+    return list(dict.fromkeys(zones))
+
+
+async def async_send_to_zones(switches, zones, hvac_mode=None, temperature=None):
+    """send the mode and/or setpoint to the zones, returns the service response"""
+    if not zones:
+        return {"zones": {}}
+    hass = switches[0].hass
+    results = await async_command_zones(
+        hass,
+        zones,
+        hvac_mode=hvac_mode,
+        temperature=temperature,
+        timeout=max(switch.command_timeout or 0 for switch in switches),
+    )
+    return {"zones": results}
+
+
+def async_setup_services(hass: HomeAssistant):
+    """register the services of the integration"""
+
+    async def async_set_zones(call: ServiceCall):
+        """set the hvac mode and/or setpoint of the zones"""
+        switches = get_switches(hass, call.data.get(ATTR_ENTITY_ID))
+        zones = resolve_zones(switches, call.data.get(const.CONF_ZONES))
+        return await async_send_to_zones(
+            switches,
+            zones,
+            hvac_mode=call.data.get(ATTR_HVAC_MODE),
+            temperature=call.data.get(ATTR_TEMPERATURE),
+        )
+
+    async def async_sync_zones(call: ServiceCall):
+        """copy the hvac mode and setpoint of the source zone to the other zones"""
+        switches = get_switches(hass, call.data.get(ATTR_ENTITY_ID))
+        source = call.data[ATTR_SOURCE]
+        source_state = parse_state(hass.states.get(source))
+        if source_state.hvac_mode not in list(HVACMode):
+            raise ServiceValidationError("Source zone {} is not available".format(source))
+        zones = [zone for zone in resolve_zones(switches, call.data.get(const.CONF_ZONES)) if zone != source]
+        return await async_send_to_zones(
+            switches,
+            zones,
+            hvac_mode=source_state.hvac_mode,
+            temperature=source_state.temperature,
+        )
+
+    async def async_evaluate(call: ServiceCall):
+        """return the outcome of an evaluation of the override per switch, without changing anything"""
+        switches = get_switches(hass, call.data.get(ATTR_ENTITY_ID))
+        zones = call.data[const.CONF_ZONES]
+        resolve_zones(switches, list(zones))
+        return {
+            switch.entity_id: switch.plan({
+                entity: dict(fields) for entity, fields in zones.items() if entity in switch.zone_entities
+            })
+            for switch in switches
+        }
+
+    async def async_get_trace(call: ServiceCall):
+        """return the recent events, decisions and commands per switch"""
+        return {
+            switch.entity_id: switch.trace.as_list()
+            for switch in get_switches(hass, call.data.get(ATTR_ENTITY_ID))
+        }
+
+    async def async_profile(call: ServiceCall):
+        """profile the event handling for a number of seconds or events, the stats are written to the config folder"""
+        if get_profile_session(hass):
+            raise ServiceValidationError("A profile of zoned heating is already running")
+        entity_ids = []
+        for switch in get_switches(hass, call.data.get(ATTR_ENTITY_ID)):
+            entities = switch.zone_entities + ([switch.controller_entity] if switch.controller_entity else [])
+            entity_ids += [entity for entity in entities if entity not in entity_ids]
+        session = ProfileSession(
+            hass,
+            entity_ids,
+            call.data[ATTR_DURATION],
+            call.data.get(ATTR_EVENTS),
+            hass.config.path(const.DOMAIN, "profile_{}".format(dt_util.utcnow().strftime("%Y%m%d_%H%M%S"))),
+        )
+        try:
+            session.async_start()
+        except ValueError as exc:
+            raise HomeAssistantError("Cannot start the profiler: {}".format(exc)) from exc
+        return {
+            "path": session.path + ".json",
+            "stats": session.path + ".prof",
+            "duration": session.duration,
+            "events": session.max_events,
+        }
+
+    hass.services.async_register(
+        const.DOMAIN,
+        SERVICE_SET_ZONES,
+        async_set_zones,
+        schema=SET_ZONES_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        const.DOMAIN,
+        SERVICE_SYNC_ZONES,
+        async_sync_zones,
+        schema=SYNC_ZONES_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        const.DOMAIN,
+        SERVICE_EVALUATE,
+        async_evaluate,
+        schema=EVALUATE_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        const.DOMAIN,
+        SERVICE_GET_TRACE,
+        async_get_trace,
+        schema=GET_TRACE_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        const.DOMAIN,
+        SERVICE_PROFILE,
+        async_profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
@@ -0,0 +1,124 @@
+"""Deferral of the first evaluation of the override while Home Assistant starts."""
+import datetime
+import logging
+import homeassistant.util.dt as dt_util
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STARTED
+from homeassistant.core import (
+    HomeAssistant,
+    callback,
+)
+from homeassistant.helpers.event import async_track_point_in_time
+
+_LOGGER = logging.getLogger(__name__)
+
+REASON_RUNNING = "running"
+REASON_STARTED = "started"
+REASON_READY = "ready"
+REASON_TIMEOUT = "timeout"
+
+
+class StartupGate:
+    """Holds back the evaluation until the entities can be trusted.
+
+    The gate opens once Home Assistant has started, once is_ready() returns
+    True, or after the timeout, whichever comes first. on_open(reason) is
+    called once when it opens.
+    """
+
+    def __init__(self, hass: HomeAssistant, is_ready, on_open, timeout: float):
+        self.hass = hass
+        self._is_ready = is_ready
+        self._on_open = on_open
+        self._timeout = timeout or 0
+        self._since = None
+        self._listeners = []
+        self._remove_timer = None
+        self.is_open = False
+        self.reason = None
+        self.duration = None
+
+    @callback
+    def async_start(self):
+        """start waiting, the gate opens at once when Home Assistant is running or the entities are ready"""
+        self._since = dt_util.utcnow()
+        if self.hass.is_running:
+            self._async_open(REASON_RUNNING)
+            return
+        if self._is_ready():
+            self._async_open(REASON_READY)
+            return
+
+        @callback
+        def started(event):
+            self._listeners.remove(remove_started)
+            self._async_open(REASON_STARTED)
+
+        remove_started = self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STARTED, started)
+        self._listeners = [remove_started]
+        self._async_start_timer()
+
+    @callback
+    def async_set_timeout(self, timeout: float):
+        """change the timeout, a waiting gate opens at once when it has already waited longer"""
+        self._timeout = timeout or 0
+        if self.is_open or self._since is None:
+            return
+        self._async_cancel_timer()
+        if self._timeout and (dt_util.utcnow() - self._since).total_seconds() >= self._timeout:
+            self._async_open(REASON_TIMEOUT)
+            return
+        self._async_start_timer()
+
+    @callback
+    def _async_start_timer(self):
+        """open the gate when the timeout has passed since the start"""
+        if not self._timeout:
+            return
+
+        @callback
+        def timer_finished(now):
+            self._remove_timer = None
+            self._async_open(REASON_TIMEOUT)
+
+        self._remove_timer = async_track_point_in_time(
+            self.hass, timer_finished, self._since + datetime.timedelta(seconds=self._timeout)
+        )
+
+    @callback
+    def _async_cancel_timer(self):
+        if self._remove_timer:
+            self._remove_timer()
+            self._remove_timer = None
+
+    @callback
+    def async_check(self):
+        """open the gate when the entities have become ready"""
+        if not self.is_open and self._since is not None and self._is_ready():
+            self._async_open(REASON_READY)
+
+    @callback
+    def async_cancel(self):
+        """stop waiting without opening the gate"""
+        self._async_cancel_timer()
+        while self._listeners:
+            self._listeners.pop()()
+
+    @callback
+    def _async_open(self, reason: str):
+        if self.is_open:
+            return
+        self.async_cancel()
+        self.is_open = True
+        self.reason = reason
+        self.duration = (dt_util.utcnow() - self._since).total_seconds()
+        _LOGGER.info("Starting evaluation after %.1f seconds (%s)", self.duration, reason)
+        self._on_open(reason)
+
+    def as_dict(self):
+        """return the outcome, for diagnostics"""
+        return {
+            "open": self.is_open,
+            "reason": self.reason,
+            "duration": self.duration,
+        }
@@ -0,0 +1,21 @@
+"""Persistence of the runtime state of the zoned heating switch."""
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from . import const
+
+STORAGE_VERSION = 1
+STORAGE_KEY = const.DOMAIN + ".{}"
+
+# seconds to wait for more changes before the state is written
+SAVE_DELAY = 10
+
+
+def get_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """return the store for the runtime state of a config entry"""
+    return Store(hass, STORAGE_VERSION, STORAGE_KEY.format(entry_id))
+
+
+async def async_remove_store(hass: HomeAssistant, entry_id: str):
+    """remove the stored runtime state of a config entry"""
+    await get_store(hass, entry_id).async_remove()
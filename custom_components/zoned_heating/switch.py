@@ -1,12 +1,14 @@
 import logging
 import datetime
+import time
 import homeassistant.util.dt as dt_util
 
 from homeassistant import config_entries
 from homeassistant.const import (
     STATE_ON,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
     ATTR_TEMPERATURE,
-    Platform,
 )
 from homeassistant.core import (
     HomeAssistant,
@@ -16,30 +18,66 @@ from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.entity import ToggleEntity
 
-from homeassistant.helpers.event import (
-    async_track_state_change_event,
-    async_track_point_in_time,
-)
+from homeassistant.helpers.event import async_track_point_in_time
 from homeassistant.components.climate.const import (
     ATTR_HVAC_MODE,
-    ATTR_HVAC_ACTION,
     HVACMode,
-    HVACAction,
-    ATTR_CURRENT_TEMPERATURE,
-    ATTR_TARGET_TEMP_STEP,
 )
 from . import const
 from .util import (
     parse_state,
-    async_set_hvac_mode,
-    async_set_temperature,
-    async_set_switch_state,
-    compute_domain,
+    as_float,
+    ZONE_ATTRIBUTES,
+    CONTROLLER_ATTRIBUTES,
+)
+from .controller import (
+    get_command_queue,
+    MAX_RETRY_BACKOFF,
+    COMMAND_STATE,
+    COMMAND_TEMPERATURE,
+    COMMAND_STATE_TEMPERATURE,
+)
+from .zones import async_command_zones
+from .router import get_event_router
+from .capabilities import ControllerProfileCache
+from .startup import StartupGate
+from .storage import (
+    get_store,
+    SAVE_DELAY,
+)
+from .filter import MeasurementFilter
+from .metrics import Metrics
+from .trace import (
+    Trace,
+    TRACE_ZONE,
+    TRACE_CONTROLLER,
+    TRACE_EVALUATE,
+    TRACE_COMMAND,
+)
+from .override import OverrideStateMachine
+from .event_log import (
+    EventLog,
+    state_record,
+    RECORD_START,
+    RECORD_STATE,
+    RECORD_COMMAND,
+    RECORD_OPTIONS,
+)
+from .demand import (
+    compute_demand,
+    ZoneDemandIndex,
 )
 
 
 _LOGGER = logging.getLogger(__name__)
 
+# actions which bring the override to the outcome of an evaluation
+ACTION_START = "start"
+ACTION_STOP = "stop"
+ACTION_UPDATE = "update"
+# the commands of an active override are sent again, after some of them failed
+ACTION_RESUME = "resume"
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -48,61 +86,510 @@ async def async_setup_entry(
 ) -> None:
     """Set up switch(es) for zoned heating platform."""
 
-    controller = config_entry.options.get(const.CONF_CONTROLLER)
-    zones = config_entry.options.get(const.CONF_ZONES, [])
-    max_setpoint = config_entry.options.get(const.CONF_MAX_SETPOINT)
-    controller_delay_time = config_entry.options.get(const.CONF_CONTROLLER_DELAY_TIME, const.DEFAULT_CONTROLLER_DELAY_TIME)
-    hysteresis = config_entry.options.get(const.CONF_HYSTERESIS, config_entry.data.get(const.CONF_HYSTERESIS, const.DEFAULT_HYSTERESIS))
-
     async_add_entities([
-        ZonedHeaterSwitch(hass, controller, zones, max_setpoint, controller_delay_time, hysteresis)
+        hass.data[const.DOMAIN][config_entry.entry_id][const.DATA_ENTITY]
     ])
 
 
+def create_switch(hass: HomeAssistant, options: dict, entry_id: str = None):
+    """Create the zoned heating switch from the options of a config entry, its runtime state is stored for the entry."""
+    entity = ZonedHeaterSwitch(hass, **switch_settings(options))
+    if entry_id:
+        entity.set_store(get_store(hass, entry_id))
+    return entity
+
+
+def switch_settings(options: dict):
+    """return the arguments of ZonedHeaterSwitch for the options of a config entry"""
+    measurement_filter = MeasurementFilter(
+        options.get(const.CONF_TEMPERATURE_RESOLUTION, const.DEFAULT_TEMPERATURE_RESOLUTION),
+        options.get(const.CONF_TEMPERATURE_MIN_DELTA, const.DEFAULT_TEMPERATURE_MIN_DELTA),
+        options.get(const.CONF_TEMPERATURE_SMOOTHING, const.DEFAULT_TEMPERATURE_SMOOTHING),
+    )
+
+    return dict(
+        controller_entity=options.get(const.CONF_CONTROLLER),
+        zone_entities=list(options.get(const.CONF_ZONES, [])),
+        max_setpoint=options.get(const.CONF_MAX_SETPOINT),
+        controller_delay_time=options.get(const.CONF_CONTROLLER_DELAY_TIME, const.DEFAULT_CONTROLLER_DELAY_TIME),
+        hysteresis=options.get(const.CONF_HYSTERESIS, const.DEFAULT_HYSTERESIS),
+        coalesce_window=options.get(const.CONF_COALESCE_WINDOW, const.DEFAULT_COALESCE_WINDOW),
+        coalesce_max_latency=options.get(const.CONF_COALESCE_MAX_LATENCY, const.DEFAULT_COALESCE_MAX_LATENCY),
+        measurement_filter=measurement_filter,
+        controller_rate_limit=options.get(const.CONF_CONTROLLER_RATE_LIMIT, const.DEFAULT_CONTROLLER_RATE_LIMIT),
+        controller_burst=options.get(const.CONF_CONTROLLER_BURST, const.DEFAULT_CONTROLLER_BURST),
+        command_timeout=options.get(const.CONF_COMMAND_TIMEOUT, const.DEFAULT_COMMAND_TIMEOUT),
+        command_retries=options.get(const.CONF_COMMAND_RETRIES, const.DEFAULT_COMMAND_RETRIES),
+        command_confirm=options.get(const.CONF_COMMAND_CONFIRM, False),
+        stop_threshold=options.get(const.CONF_STOP_THRESHOLD, const.DEFAULT_STOP_THRESHOLD),
+        min_on_time=options.get(const.CONF_MIN_ON_TIME, const.DEFAULT_MIN_ON_TIME),
+        min_off_time=options.get(const.CONF_MIN_OFF_TIME, const.DEFAULT_MIN_OFF_TIME),
+        event_log=options.get(const.CONF_EVENT_LOG, False),
+        metric_sensors=options.get(const.CONF_METRIC_SENSORS, False),
+        startup_zone_fraction=options.get(const.CONF_STARTUP_ZONE_FRACTION, const.DEFAULT_STARTUP_ZONE_FRACTION),
+        startup_timeout=options.get(const.CONF_STARTUP_TIMEOUT, const.DEFAULT_STARTUP_TIMEOUT),
+    )
+
+
 class ZonedHeaterSwitch(ToggleEntity, RestoreEntity):
 
     _attr_name = "Zoned Heating"
-
-    def __init__(self, hass, controller_entity, zone_entities, max_setpoint, controller_delay_time, hysteresis):
+    # the settings do not change with the state, only the runtime state is recorded
+    _unrecorded_attributes = frozenset({
+        const.CONF_CONTROLLER,
+        const.CONF_ZONES,
+        const.CONF_MAX_SETPOINT,
+        const.CONF_CONTROLLER_DELAY_TIME,
+        const.CONF_HYSTERESIS,
+        const.CONF_STOP_THRESHOLD,
+        const.CONF_MIN_ON_TIME,
+        const.CONF_MIN_OFF_TIME,
+        const.CONF_COALESCE_WINDOW,
+        const.CONF_COALESCE_MAX_LATENCY,
+        const.ATTR_CONTROLLER_COMMANDS,
+    })
+
+    def __init__(
+        self,
+        hass,
+        controller_entity,
+        zone_entities,
+        max_setpoint,
+        controller_delay_time,
+        hysteresis,
+        coalesce_window=const.DEFAULT_COALESCE_WINDOW,
+        coalesce_max_latency=const.DEFAULT_COALESCE_MAX_LATENCY,
+        measurement_filter=None,
+        controller_rate_limit=const.DEFAULT_CONTROLLER_RATE_LIMIT,
+        controller_burst=const.DEFAULT_CONTROLLER_BURST,
+        command_timeout=const.DEFAULT_COMMAND_TIMEOUT,
+        command_retries=const.DEFAULT_COMMAND_RETRIES,
+        command_confirm=False,
+        stop_threshold=const.DEFAULT_STOP_THRESHOLD,
+        min_on_time=const.DEFAULT_MIN_ON_TIME,
+        min_off_time=const.DEFAULT_MIN_OFF_TIME,
+        event_log=False,
+        metric_sensors=False,
+        startup_zone_fraction=const.DEFAULT_STARTUP_ZONE_FRACTION,
+        startup_timeout=const.DEFAULT_STARTUP_TIMEOUT,
+    ):
         self.hass = hass
         self._controller_entity = controller_entity
         self._zone_entities = zone_entities
         self._max_setpoint = max_setpoint
         self._controller_delay_time = controller_delay_time
         self._hysteresis = hysteresis
+        self._coalesce_window = coalesce_window
+        self._coalesce_max_latency = coalesce_max_latency
+        self._measurement_filter = measurement_filter or MeasurementFilter()
+        self._stop_threshold = stop_threshold
+        self._min_on_time = min_on_time
+        self._min_off_time = min_off_time
+        self._controller_rate_limit = controller_rate_limit
+        self._controller_burst = controller_burst
+        self._command_timeout = command_timeout
+        self._command_retries = command_retries
+        self._command_confirm = command_confirm
+        self._event_log_enabled = event_log
+        self._metric_sensors = metric_sensors
+        self._startup_zone_fraction = startup_zone_fraction
+        self._startup_timeout = startup_timeout
+        self._event_log = None
+        self._event_log_listener = None
+        self._trace = Trace()
+        self._trace_listener = None
+        self._store = None
+        self._update_listeners = []
+        self._metrics = Metrics()
 
         self._enabled = None
         self._state_listeners = []
-        self._ignore_controller_state_change_timer = None
+        self._zone_listeners = {}
+        self._pending_evaluation_timer = None
+        self._pending_evaluation_since = None
+        # evaluations run one at a time, such that a start cannot read the controller while a stop is still sending;
+        # requests during an evaluation are merged into a single evaluation which runs after it
+        self._evaluation_running = False
+        self._evaluation_pending = False
+        self._retry_timer = None
+        # commands of the last action which are being sent in the background
+        self._command_task = None
+        self._command_action = None
         self._override_active = False
+        self._override_incomplete = False
         self._temperature_increase = 0
         self._stored_controller_setpoint = None
         self._stored_controller_state = None
+        self._zone_demand = ZoneDemandIndex()
+        self._dominant_zone = None
+        self._controller_profiles = ControllerProfileCache(controller_entity) if controller_entity else None
+        self._controller_commands = get_command_queue(hass, controller_entity) if controller_entity else None
+        if self._controller_commands:
+            self._controller_commands.configure(
+                self, controller_rate_limit, controller_burst, command_timeout, command_retries, command_confirm
+            )
+
+        self._startup_gate = StartupGate(
+            hass,
+            self._is_ready_for_evaluation,
+            self._async_startup_gate_opened,
+            startup_timeout,
+        )
+        self._override_state = OverrideStateMachine(
+            hass,
+            self._async_override_guard_expired,
+            *self._override_thresholds(),
+        )
 
         super().__init__()
 
+    def _override_thresholds(self):
+        """return the settings of the override state machine"""
+        try:
+            hysteresis = float(self._hysteresis or 0)
+        except Exception:
+            hysteresis = float(const.DEFAULT_HYSTERESIS)
+        if self._stop_threshold is None:
+            return hysteresis, hysteresis, self._min_on_time, self._min_off_time
+        return hysteresis, float(self._stop_threshold), self._min_on_time, self._min_off_time
+
+    def set_store(self, store):
+        """persist the runtime state in a (helpers.storage) Store"""
+        self._store = store
+
     async def async_added_to_hass(self):
         await super().async_added_to_hass()
         _LOGGER.debug("Registering entity %s", self.entity_id)
 
+        data = await self._store.async_load() if self._store else None
+        if isinstance(data, dict):
+            _LOGGER.debug("Restored runtime state prior to restart: %s", data)
+            self._restore_runtime_data(data)
+        else:
+            await self._async_restore_last_state()
+
+        if self._event_log_enabled and self._controller_entity:
+            self._async_start_event_log()
+        if self._controller_commands:
+            self._trace_listener = self._controller_commands.async_add_listener(self._async_trace_command)
+
+        if self._enabled:
+            await self.async_start_state_listeners()
+        # zones which are not available yet keep their stored demand, until the startup gate opens
+        self._rebuild_zone_demand(keep_unavailable=isinstance(data, dict), measured=True)
+        # the first evaluation waits until the controller and zones can be trusted
+        self._startup_gate.async_start()
+
+    def _is_ready_for_evaluation(self):
+        """whether the controller and enough zones report valid states"""
+        controller_state = self.hass.states.get(self._controller_entity) if self._controller_entity else None
+        if controller_state is None or controller_state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+            return False
+        if not self._zone_entities:
+            return True
+        valid = 0
+        for entity in self._zone_entities:
+            state = self.hass.states.get(entity)
+            if (
+                state is not None and
+                state.state not in (STATE_UNAVAILABLE, STATE_UNKNOWN) and
+                isinstance(parse_state(state).current_temperature, (int, float))
+            ):
+                valid += 1
+        return valid >= self._startup_zone_fraction * len(self._zone_entities)
+
+    @callback
+    def _async_startup_gate_opened(self, reason: str):
+        """evaluate the override with the zone changes received while starting up, at once"""
+        self._cancel_pending_evaluation()
+        # the stored demand of zones which are still unavailable is no longer trusted
+        self._rebuild_zone_demand()
+        self.hass.async_create_task(self.async_calculate_override())
+
+    async def _async_restore_last_state(self):
+        """restore the runtime state from the state attributes, as saved by older versions"""
         state = await self.async_get_last_state()
         if state:
             _LOGGER.debug("Restored data prior to restart: %s", state.attributes)
             self._enabled = state.state == STATE_ON
-            self._override_active = state.attributes.get(const.ATTR_OVERRIDE_ACTIVE)
-            self._temperature_increase = state.attributes.get(const.ATTR_TEMPERATURE_INCREASE)
-            self._stored_controller_setpoint = state.attributes.get(const.ATTR_STORED_CONTROLLER_SETPOINT)
+            self._override_active = bool(state.attributes.get(const.ATTR_OVERRIDE_ACTIVE))
+            self._temperature_increase = as_float(state.attributes.get(const.ATTR_TEMPERATURE_INCREASE)) or 0
+            self._stored_controller_setpoint = as_float(state.attributes.get(const.ATTR_STORED_CONTROLLER_SETPOINT))
             self._stored_controller_state = state.attributes.get(const.ATTR_STORED_CONTROLLER_STATE)
         else:
             self._enabled = True
 
-        if self._enabled:
-            await self.async_start_state_listeners()
-        await self.async_calculate_override()
+    def _restore_runtime_data(self, data: dict):
+        """restore the runtime state which was returned by _runtime_data"""
+        self._enabled = data.get(const.ATTR_ENABLED, True) is not False
+        self._override_active = bool(data.get(const.ATTR_OVERRIDE_ACTIVE))
+        self._temperature_increase = as_float(data.get(const.ATTR_TEMPERATURE_INCREASE)) or 0
+        self._stored_controller_state = data.get(const.ATTR_STORED_CONTROLLER_STATE)
+        self._stored_controller_setpoint = as_float(data.get(const.ATTR_STORED_CONTROLLER_SETPOINT))
+        self._measurement_filter.restore(data.get(const.ATTR_MEASUREMENT_FILTER))
+        zone_demand = data.get(const.ATTR_ZONE_DEMAND)
+        if isinstance(zone_demand, dict):
+            for entity, demand in zone_demand.items():
+                if entity in self._zone_entities:
+                    self._zone_demand.update(entity, as_float(demand))
+
+    def _runtime_data(self):
+        """return the runtime state, for storage"""
+        return {
+            const.ATTR_ENABLED: self._enabled,
+            const.ATTR_OVERRIDE_ACTIVE: self._override_active,
+            const.ATTR_TEMPERATURE_INCREASE: self._temperature_increase,
+            const.ATTR_STORED_CONTROLLER_STATE: self._stored_controller_state,
+            const.ATTR_STORED_CONTROLLER_SETPOINT: self._stored_controller_setpoint,
+            const.ATTR_MEASUREMENT_FILTER: self._measurement_filter.as_dict(),
+            const.ATTR_ZONE_DEMAND: dict(self._zone_demand.items()),
+        }
+
+    @callback
+    def _async_schedule_save(self):
+        """write the runtime state after SAVE_DELAY seconds, changes in the meantime are written at once"""
+        if self._store:
+            self._store.async_delay_save(self._runtime_data, SAVE_DELAY)
+
+    @callback
+    def async_write_ha_state(self):
+        """write the state to Home Assistant, and the runtime state to the store"""
+        super().async_write_ha_state()
+        self._async_schedule_save()
+        for listener in list(self._update_listeners):
+            listener()
+
+    @callback
+    def async_add_listener(self, listener):
+        """call listener() after every state write, returns a function to remove it"""
+        self._update_listeners.append(listener)
+
+        def remove():
+            if listener in self._update_listeners:
+                self._update_listeners.remove(listener)
+        return remove
+
+    @property
+    def override_active(self):
+        """whether the controller is overridden"""
+        return bool(self._override_active)
+
+    @property
+    def temperature_increase(self):
+        """temperature increase of the dominant zone"""
+        return self._temperature_increase
+
+    @property
+    def dominant_zone(self):
+        """zone with the highest temperature increase"""
+        return self._dominant_zone
+
+    @property
+    def metric_sensors(self):
+        """whether the metrics are exposed as sensors"""
+        return bool(self._metric_sensors)
+
+    @property
+    def trace(self):
+        """recent events, decisions and commands"""
+        return self._trace
+
+    @property
+    def metrics(self):
+        """counters and timings of the work done by this switch"""
+        return self._metrics
+
+    @property
+    def controller_entity(self):
+        """entity of the controller"""
+        return self._controller_entity
+
+    @property
+    def zone_entities(self):
+        """entities of the zones"""
+        return list(self._zone_entities)
+
+    @property
+    def command_timeout(self):
+        """seconds after which a command is considered failed"""
+        return self._command_timeout
+
+    @property
+    def controller_commands(self):
+        """command queue of the controller, shared with other entries using it"""
+        return self._controller_commands
+
+    def diagnostics(self):
+        """return the settings and runtime state, for the diagnostics of the config entry"""
+        return {
+            "entity_id": self.entity_id,
+            "config": self._config(),
+            "runtime": self._runtime_data(),
+            const.ATTR_DOMINANT_ZONE: self._dominant_zone,
+            const.ATTR_CONTROLLER_COMMANDS: dict(self._controller_commands.stats) if self._controller_commands else None,
+            "event_log": self._event_log.path if self._event_log else None,
+            "startup": self._startup_gate.as_dict(),
+            "controller_profile": self._controller_profiles.get(
+                self.hass.states.get(self._controller_entity)
+            )._asdict() if self._controller_profiles else None,
+            "metrics": {
+                "switch": self._metrics.as_dict(),
+                "controller": self._controller_commands.metrics.as_dict() if self._controller_commands else None,
+                "router": get_event_router(self.hass).metrics.as_dict(),
+            },
+            "trace": self._trace.as_list(),
+        }
 
     async def async_will_remove_from_hass(self):
         """remove entity from hass."""
         await self.async_stop_state_listeners()
+        self._override_state.cancel()
+        self._cancel_retry()
+        self._startup_gate.async_cancel()
+        if self._controller_commands:
+            self._controller_commands.release(self)
+        if self._store:
+            await self._store.async_save(self._runtime_data())
+        if self._trace_listener:
+            self._trace_listener()
+            self._trace_listener = None
+        if self._event_log:
+            self._event_log_listener()
+            await self._event_log.async_flush()
+            self._event_log = None
+
+    def _config(self):
+        """return the settings of the entity, by option name"""
+        resolution, min_delta, smoothing = self._measurement_filter.settings
+        return {
+            const.CONF_CONTROLLER: self._controller_entity,
+            const.CONF_ZONES: self._zone_entities,
+            const.CONF_MAX_SETPOINT: self._max_setpoint,
+            const.CONF_CONTROLLER_DELAY_TIME: self._controller_delay_time,
+            const.CONF_HYSTERESIS: self._hysteresis,
+            const.CONF_STOP_THRESHOLD: self._stop_threshold,
+            const.CONF_MIN_ON_TIME: self._min_on_time,
+            const.CONF_MIN_OFF_TIME: self._min_off_time,
+            const.CONF_COALESCE_WINDOW: self._coalesce_window,
+            const.CONF_COALESCE_MAX_LATENCY: self._coalesce_max_latency,
+            const.CONF_TEMPERATURE_RESOLUTION: resolution,
+            const.CONF_TEMPERATURE_MIN_DELTA: min_delta,
+            const.CONF_TEMPERATURE_SMOOTHING: smoothing,
+            const.CONF_CONTROLLER_RATE_LIMIT: self._controller_rate_limit,
+            const.CONF_CONTROLLER_BURST: self._controller_burst,
+            const.CONF_COMMAND_TIMEOUT: self._command_timeout,
+            const.CONF_COMMAND_RETRIES: self._command_retries,
+            const.CONF_COMMAND_CONFIRM: self._command_confirm,
+            const.CONF_STARTUP_ZONE_FRACTION: self._startup_zone_fraction,
+            const.CONF_STARTUP_TIMEOUT: self._startup_timeout,
+        }
+
+    async def async_apply_options(self, options: dict):
+        """apply changed options of the config entry in place, returns False if the entity must be recreated"""
+        settings = switch_settings(options)
+        if (
+            settings["controller_entity"] != self._controller_entity or
+            bool(settings["event_log"]) != bool(self._event_log_enabled) or
+            bool(settings["metric_sensors"]) != bool(self._metric_sensors)
+        ):
+            return False
+
+        self._max_setpoint = settings["max_setpoint"]
+        self._controller_delay_time = settings["controller_delay_time"]
+        self._hysteresis = settings["hysteresis"]
+        self._stop_threshold = settings["stop_threshold"]
+        self._min_on_time = settings["min_on_time"]
+        self._min_off_time = settings["min_off_time"]
+        self._override_state.configure(*self._override_thresholds())
+        self._coalesce_window = settings["coalesce_window"]
+        self._coalesce_max_latency = settings["coalesce_max_latency"]
+        self._measurement_filter.configure(*settings["measurement_filter"].settings)
+        self._controller_rate_limit = settings["controller_rate_limit"]
+        self._controller_burst = settings["controller_burst"]
+        self._command_timeout = settings["command_timeout"]
+        self._command_retries = settings["command_retries"]
+        self._command_confirm = settings["command_confirm"]
+        self._startup_zone_fraction = settings["startup_zone_fraction"]
+        self._startup_timeout = settings["startup_timeout"]
+        if self._controller_commands:
+            self._controller_commands.configure(
+                self,
+                self._controller_rate_limit,
+                self._controller_burst,
+                self._command_timeout,
+                self._command_retries,
+                self._command_confirm,
+            )
+
+        # only the listeners of added and removed zones are changed
+        zones = settings["zone_entities"]
+        removed = [entity for entity in self._zone_entities if entity not in zones]
+        added = [entity for entity in zones if entity not in self._zone_entities]
+        self._zone_entities = zones
+        for entity in removed:
+            self._async_unsubscribe_zone(entity)
+            self._measurement_filter.remove(entity)
+        if self._enabled:
+            if self._state_listeners:
+                for entity in added:
+                    self._async_subscribe_zone(entity)
+            else:
+                await self.async_start_state_listeners()
+        _LOGGER.debug("Applied options: added zones=%s removed zones=%s", added, removed)
+
+        if self._event_log:
+            self._event_log.async_record(RECORD_OPTIONS, options=self._config())
+
+        self._rebuild_zone_demand()
+        if not self._startup_gate.is_open:
+            # a waiting gate uses the new timeout, counted from the start
+            self._startup_gate.async_set_timeout(self._startup_timeout)
+            self._startup_gate.async_check()
+            return True
+
+        # an active override is kept, its commands are planned again with the new settings
+        if self._override_active:
+            self._override_incomplete = True
+        await self.async_calculate_override()
+        self.async_write_ha_state()
+        return True
+
+    @callback
+    def _async_trace_command(self, kind, args, context):
+        """add a command sent to the controller to the trace"""
+        self._trace.add(TRACE_COMMAND, kind, list(args), context.id)
+
+    @callback
+    def _async_start_event_log(self):
+        """start recording the received events and sent commands"""
+        self._event_log = EventLog(
+            self.hass,
+            self.hass.config.path(const.DOMAIN, "{}_events.jsonl".format(self.entity_id.split(".").pop())),
+        )
+        self._event_log.async_record(
+            RECORD_START,
+            entity=self.entity_id,
+            options=self._config(),
+            enabled=self._enabled,
+            override_active=self._override_active,
+            stored_controller_state=self._stored_controller_state,
+            stored_controller_setpoint=self._stored_controller_setpoint,
+            states={
+                self._controller_entity: state_record(self.hass.states.get(self._controller_entity), None),
+                **{
+                    entity: state_record(self.hass.states.get(entity))
+                    for entity in self._zone_entities
+                },
+            },
+        )
+
+        @callback
+        def async_command_sent(kind, args, context):
+            self._event_log.async_record(
+                RECORD_COMMAND, entity=self._controller_entity, command=kind, args=list(args), context=context.id
+            )
+        self._event_log_listener = self._controller_commands.async_add_listener(async_command_sent)
+        _LOGGER.info("Recording events of %s to %s", self.entity_id, self._event_log.path)
 
     @property
     def is_on(self):
@@ -118,10 +605,17 @@ class ZonedHeaterSwitch(ToggleEntity, RestoreEntity):
             const.CONF_MAX_SETPOINT: self._max_setpoint,
             const.CONF_CONTROLLER_DELAY_TIME: self._controller_delay_time,
             const.CONF_HYSTERESIS: self._hysteresis,
+            const.CONF_STOP_THRESHOLD: self._stop_threshold,
+            const.CONF_MIN_ON_TIME: self._min_on_time,
+            const.CONF_MIN_OFF_TIME: self._min_off_time,
+            const.CONF_COALESCE_WINDOW: self._coalesce_window,
+            const.CONF_COALESCE_MAX_LATENCY: self._coalesce_max_latency,
             const.ATTR_OVERRIDE_ACTIVE: self._override_active,
             const.ATTR_TEMPERATURE_INCREASE: self._temperature_increase,
+            const.ATTR_DOMINANT_ZONE: self._dominant_zone,
             const.ATTR_STORED_CONTROLLER_STATE: self._stored_controller_state,
             const.ATTR_STORED_CONTROLLER_SETPOINT: self._stored_controller_setpoint,
+            const.ATTR_CONTROLLER_COMMANDS: dict(self._controller_commands.stats) if self._controller_commands else None,
         }
 
     async def async_turn_on(self, **kwargs):
@@ -131,7 +625,9 @@ class ZonedHeaterSwitch(ToggleEntity, RestoreEntity):
         self._enabled = True
         _LOGGER.debug("Zoned heating turned on")
         await self.async_start_state_listeners()
+        self._rebuild_zone_demand(measured=True)
         await self.async_calculate_override()
+        self.async_write_ha_state()
 
     async def async_turn_off(self, **kwargs):
         """Turn the entity off."""
@@ -141,280 +637,677 @@ class ZonedHeaterSwitch(ToggleEntity, RestoreEntity):
         _LOGGER.debug("Zoned heating turned off")
         await self.async_stop_state_listeners()
         await self.async_calculate_override()
+        self.async_write_ha_state()
 
     async def async_start_state_listeners(self):
         """start watching for state changes of controller / zone entities"""
         await self.async_stop_state_listeners()
         if not len(self._zone_entities) or not self._controller_entity:
             return
+        router = get_event_router(self.hass)
         self._state_listeners = [
-            async_track_state_change_event(
-                self.hass,
+            router.async_subscribe(
                 self._controller_entity,
-                self.async_controller_state_changed,
+                self._async_controller_state_filter,
+                CONTROLLER_ATTRIBUTES,
             ),
-            async_track_state_change_event(
-                self.hass,
-                self._zone_entities,
-                self.async_zone_state_changed,
-            )
         ]
+        if self._event_log:
+            self._state_listeners.append(router.async_subscribe(
+                self._controller_entity,
+                self._async_record_state_event,
+            ))
+        for entity in self._zone_entities:
+            self._async_subscribe_zone(entity)
         _LOGGER.debug("Registered state listeners for controller=%s zones=%s", self._controller_entity, self._zone_entities)
 
     async def async_stop_state_listeners(self):
         """stop watching for state changes of controller / zone entities"""
         while len(self._state_listeners):
             self._state_listeners.pop()()
+        for entity in list(self._zone_listeners):
+            self._async_unsubscribe_zone(entity)
+        self._cancel_pending_evaluation()
+
+    @callback
+    def _async_subscribe_zone(self, entity: str):
+        """start watching for state changes of a zone"""
+        router = get_event_router(self.hass)
+        listeners = [router.async_subscribe(entity, self._async_zone_state_filter, ZONE_ATTRIBUTES)]
+        if self._event_log:
+            listeners.append(router.async_subscribe(entity, self._async_record_state_event))
+        self._zone_listeners[entity] = listeners
+
+    @callback
+    def _async_unsubscribe_zone(self, entity: str):
+        """stop watching for state changes of a zone"""
+        for remove in self._zone_listeners.pop(entity, []):
+            remove()
+
+    @callback
+    def _async_record_state_event(self, event, old_state, new_state):
+        """write a state change of the controller or a zone to the event log"""
+        entity = event.data["entity_id"]
+        self._event_log.async_record(
+            RECORD_STATE,
+            entity=entity,
+            state=state_record(event.data["new_state"]),
+            context=event.context.id,
+        )
+
+    @callback
+    def _async_controller_state_filter(self, event, old_state, new_state):
+        """drop controller events which cannot affect the override before scheduling the handler"""
+        self._metrics.increment("controller_events")
+        if not self._startup_gate.is_open:
+            self._startup_gate.async_check()
+        if not self._override_active:
+            self._metrics.increment("controller_events_skipped")
+            return
+        self.hass.async_create_task(self.async_controller_state_changed(event, old_state, new_state))
+
+    @callback
+    def _async_zone_state_filter(self, event, old_state, new_state):
+        """schedule the handler of a zone event with a change in setpoint, temperature, mode or action"""
+        self._metrics.increment("zone_events")
+        self.hass.async_create_task(self.async_zone_state_changed(event, old_state, new_state))
 
-    async def async_controller_state_changed(self, event):
+    async def async_controller_state_changed(self, event, old_state, new_state):
         """fired when controller entity changes"""
-        if self._ignore_controller_state_change_timer or not self._override_active:
+        if not self._override_active:
+            return
+        entity = event.data["entity_id"]
+        if self._controller_commands.is_own_context(event.context):
+            self._trace.add(TRACE_CONTROLLER, entity, new_state.hvac_mode, new_state.temperature, "echo")
+            self._metrics.increment("echo_events_ignored")
             return
-        old_state = parse_state(event.data["old_state"])
-        new_state = parse_state(event.data["new_state"])
 
-        if new_state[ATTR_TEMPERATURE] != old_state[ATTR_TEMPERATURE]:
+        if new_state.temperature != old_state.temperature and self._controller_commands.was_sent(
+            ATTR_TEMPERATURE, new_state.temperature, self._controller_delay_time
+        ):
+            # result of a command, reported without its context
+            self._trace.add(TRACE_CONTROLLER, entity, new_state.hvac_mode, new_state.temperature, "echo_setpoint")
+            self._metrics.increment("echo_setpoints_ignored")
+        elif new_state.temperature != old_state.temperature:
             # if controller setpoint has changed, make sure to store it
-            _LOGGER.debug("Storing controller setpoint=%s", new_state[ATTR_TEMPERATURE])
-            self._stored_controller_setpoint = new_state[ATTR_TEMPERATURE]
+            self._trace.add(TRACE_CONTROLLER, entity, new_state.hvac_mode, new_state.temperature, "stored_setpoint")
+            self._stored_controller_setpoint = as_float(new_state.temperature)
+            self._controller_commands.forget_sent(ATTR_TEMPERATURE)
             self.async_write_ha_state()
 
-        if new_state[ATTR_HVAC_MODE] != old_state[ATTR_HVAC_MODE] and new_state[ATTR_HVAC_MODE] == HVACMode.OFF:
-            _LOGGER.debug("Controller was turned off, disable zones")
+        if (
+            new_state.hvac_mode != old_state.hvac_mode and
+            new_state.hvac_mode == HVACMode.OFF and
+            not self._controller_commands.was_sent(ATTR_HVAC_MODE, HVACMode.OFF, self._controller_delay_time)
+        ):
+            self._trace.add(TRACE_CONTROLLER, entity, new_state.hvac_mode, new_state.temperature, "turned_off")
             await self.async_turn_off_zones()
 
-    async def async_zone_state_changed(self, event):
+    async def async_zone_state_changed(self, event, old_state, new_state):
         """fired when zone entity changes"""
         entity = event.data["entity_id"]
-        old_state = parse_state(event.data["old_state"])
-        new_state = parse_state(event.data["new_state"])
-
-        _LOGGER.debug("Zone event received for %s: old=%s new=%s", entity, {
-            "temp": old_state.get(ATTR_TEMPERATURE),
-            "current": old_state.get(ATTR_CURRENT_TEMPERATURE),
-            "action": old_state.get(ATTR_HVAC_ACTION),
-        }, {
-            "temp": new_state.get(ATTR_TEMPERATURE),
-            "current": new_state.get(ATTR_CURRENT_TEMPERATURE),
-            "action": new_state.get(ATTR_HVAC_ACTION),
-        })
-
-        # Re-evaluate override when either the target setpoint or the current
-        # measured temperature changes for a zone. This ensures drops in room
-        # temperature trigger an evaluation even if the setpoint hasn't moved.
+        if entity not in self._zone_listeners:
+            # zone was removed while the event was pending
+            return
+
+        # Re-evaluate override when either the target setpoint or the (filtered)
+        # measured temperature changes the demand of a zone. This ensures drops in
+        # room temperature trigger an evaluation even if the setpoint hasn't moved,
+        # while measurement noise does not.
+        if new_state.current_temperature != old_state.current_temperature:
+            current_temperature = self._measurement_filter.update(entity, new_state.current_temperature)
+        else:
+            # only a new measurement is fed to the filter, not e.g. a change of the hvac action
+            current_temperature = self._measurement_filter.current(entity, new_state.current_temperature)
+        demand_changed = self._update_zone_demand(entity, new_state, current_temperature)
+        self._trace.add(
+            TRACE_ZONE,
+            entity,
+            new_state.hvac_mode,
+            new_state.temperature,
+            new_state.current_temperature,
+            new_state.hvac_action,
+            self._zone_demand.get(entity),
+            demand_changed,
+        )
+        if demand_changed:
+            self._async_schedule_save()
+
+        # an updated action or mode of a zone may also require an update of the controller
         if (
-            (old_state[ATTR_TEMPERATURE] != new_state[ATTR_TEMPERATURE] or
-             old_state[ATTR_CURRENT_TEMPERATURE] != new_state[ATTR_CURRENT_TEMPERATURE]) and
-            isinstance(new_state[ATTR_TEMPERATURE], (int, float)) and
-            isinstance(new_state[ATTR_CURRENT_TEMPERATURE], (int, float))
+            demand_changed or
+            old_state.hvac_action != new_state.hvac_action or
+            old_state.hvac_mode != new_state.hvac_mode
         ):
-            if old_state[ATTR_TEMPERATURE] != new_state[ATTR_TEMPERATURE]:
-                _LOGGER.debug("Zone %s updated: setpoint=%s", entity, new_state[ATTR_TEMPERATURE])
-            if old_state[ATTR_CURRENT_TEMPERATURE] != new_state[ATTR_CURRENT_TEMPERATURE]:
-                _LOGGER.debug("Zone %s updated: current=%s", entity, new_state[ATTR_CURRENT_TEMPERATURE])
-            await self.async_calculate_override()
+            await self.async_schedule_calculate_override()
 
-        if old_state[ATTR_HVAC_ACTION] != new_state[ATTR_HVAC_ACTION] or old_state[ATTR_HVAC_MODE] != new_state[ATTR_HVAC_MODE]:
-            # action or mode of a zone was updated, check whether controller needs to be updated
-            _LOGGER.debug("Zone %s updated: action=%s", entity, new_state[ATTR_HVAC_ACTION])
+    async def async_schedule_calculate_override(self):
+        """calculate the override after the coalescing window, such that a burst of zone events is handled at once"""
+        if not self._startup_gate.is_open:
+            # zones which become available during startup are evaluated together once the gate opens
+            self._startup_gate.async_check()
+            return
+        self._metrics.increment("evaluations_scheduled")
+        if not self._coalesce_window:
             await self.async_calculate_override()
+            return
 
-    async def async_calculate_override(self):
-        """calculate whether override should be active and determine setpoint"""
-        states = [
-            parse_state(self.hass.states.get(entity))
-            for entity in self._zone_entities
-        ]
+        now = dt_util.utcnow()
+        if self._pending_evaluation_since is None:
+            self._pending_evaluation_since = now
+        if self._pending_evaluation_timer:
+            self._pending_evaluation_timer()
+
+        # every new event extends the window, but never beyond the maximum latency of the first event
+        deadline = min(
+            now + datetime.timedelta(seconds=self._coalesce_window),
+            self._pending_evaluation_since + datetime.timedelta(seconds=max(self._coalesce_max_latency, self._coalesce_window)),
+        )
 
-        # Diagnostic: build a compact view of zones for logging to aid debugging
-        try:
-            zone_debug = [
-                {
-                    "entity": entity,
-                    "temp": state.get(ATTR_TEMPERATURE),
-                    "current": state.get(ATTR_CURRENT_TEMPERATURE),
-                    "mode": state.get(ATTR_HVAC_MODE),
-                    "action": state.get(ATTR_HVAC_ACTION),
-                }
-                for entity, state in zip(self._zone_entities, states)
-            ]
-        except Exception:
-            zone_debug = None
-        _LOGGER.debug("Hysteresis calc: enabled=%s hysteresis=%s zones=%s", self._enabled, self._hysteresis, zone_debug)
-
-        # Compute how much each zone would need to increase to reach its
-        # target setpoint. Consider zones where the HVAC mode is not OFF
-        # (so heat/auto modes are included). We deliberately ignore the
-        # `hvac_action` because some TRVs report `idle` even when in heat
-        # mode due to their internal hysteresis.
-        temperature_increase_per_state = []
-        for state in states:
-            t = state.get(ATTR_TEMPERATURE)
-            cur = state.get(ATTR_CURRENT_TEMPERATURE)
-            if (
-                isinstance(t, (int, float)) and
-                isinstance(cur, (int, float)) and
-                state.get(ATTR_HVAC_MODE) != HVACMode.OFF
+        @callback
+        def timer_finished(now):
+            self._pending_evaluation_timer = None
+            self._pending_evaluation_since = None
+            self.hass.async_create_task(self.async_calculate_override())
+
+        self._pending_evaluation_timer = async_track_point_in_time(
+            self.hass, timer_finished, deadline
+        )
+
+    def _cancel_pending_evaluation(self):
+        """discard a scheduled calculation of the override"""
+        if self._pending_evaluation_timer:
+            self._pending_evaluation_timer()
+        self._pending_evaluation_timer = None
+        self._pending_evaluation_since = None
+
+    def _update_zone_demand(self, entity: str, state, current_temperature):
+        """update the demand of a zone from its snapshot and filtered temperature, returns whether it changed"""
+        if current_temperature != state.current_temperature:
+            state = state._replace(current_temperature=current_temperature)
+        return self._zone_demand.update(entity, compute_demand(state))
+
+    def _rebuild_zone_demand(self, keep_unavailable: bool = False, measured: bool = False):
+        """(re)compute the demand of all zones from their current state
+
+        measured indicates the zones may report measurements which were not fed
+        to the measurement filter yet, since their state was not followed.
+        """
+        if not keep_unavailable:
+            self._zone_demand.clear()
+        for entity in self._zone_entities:
+            state = self.hass.states.get(entity)
+            if keep_unavailable and entity in self._zone_demand and (
+                state is None or state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN)
             ):
+                continue
+            snapshot = parse_state(state)
+            if measured or self._measurement_filter.get(entity) is None:
+                current_temperature = self._measurement_filter.update(entity, snapshot.current_temperature)
+            else:
+                # the current measurement was fed to the filter when it arrived
+                current_temperature = self._measurement_filter.current(entity, snapshot.current_temperature)
+            self._update_zone_demand(entity, snapshot, current_temperature)
+
+    async def async_calculate_override(self):
+        """calculate whether override should be active and determine setpoint
+
+        While an evaluation is running, the request is merged into a single
+        evaluation which runs once it has finished, with the newest state of
+        the zones.
+        """
+        if self._evaluation_running:
+            self._evaluation_pending = True
+            self._metrics.increment("evaluations_merged")
+            return
+        self._evaluation_running = True
+        try:
+            while True:
+                self._evaluation_pending = False
+                started = time.perf_counter()
                 try:
-                    temperature_increase_per_state.append(float(t) - float(cur))
-                except Exception:
-                    continue
-
-        override_active = False
-        temperature_increase = 0
-
-        if len(temperature_increase_per_state) and self._enabled:
-            temperature_increase = round(max(temperature_increase_per_state), 1)
-            # Only activate override when the required increase exceeds configured hysteresis
-            try:
-                hysteresis = float(self._hysteresis or 0)
-            except Exception:
-                hysteresis = float(const.DEFAULT_HYSTERESIS)
-            override_active = temperature_increase > hysteresis
-
-        if (not self._override_active and not override_active) or (
-            self._temperature_increase == temperature_increase and
-            override_active == self._override_active
-        ):
+                    await self._async_calculate_override()
+                finally:
+                    self._metrics.increment("evaluations")
+                    self._metrics.observe("evaluation_duration", time.perf_counter() - started)
+                if not self._evaluation_pending:
+                    break
+        finally:
+            self._evaluation_running = False
+
+    async def _async_calculate_override(self):
+        self._cancel_retry()
+        dominant_zone, demand = self._zone_demand.dominant()
+        dominant_zone, temperature_increase = self._requested_increase(dominant_zone, demand)
+
+        # Only activate override when the required increase exceeds configured hysteresis,
+        # and keep it active until the increase has dropped to the stop threshold
+        override_active = self._override_state.evaluate(self._override_active, temperature_increase, self._enabled)
+        temperature_increase = temperature_increase or 0
+
+        dominant_zone_changed = dominant_zone != self._dominant_zone
+        self._dominant_zone = dominant_zone
+
+        action = self._override_action(override_active, temperature_increase)
+        replacing = False
+        if action is not None:
+            action, replacing = self._replacing_action(action)
+        self._trace.add(TRACE_EVALUATE, dominant_zone, demand, temperature_increase, override_active, action)
+        if action is None:
             # nothing to do
+            if dominant_zone_changed:
+                self.async_write_ha_state()
             return
 
-        _LOGGER.debug(
-            "Updated override temperature_increase=%s, override_active=%s",
-            temperature_increase,
-            override_active,
-        )
+        if action == ACTION_START:
+            await self.async_start_override_mode(temperature_increase, replacing)
+        elif action == ACTION_STOP:
+            await self.async_stop_override_mode(replacing)
+        else:
+            await self.async_update_override_setpoint(temperature_increase, action, replacing)
 
+        self.async_write_ha_state()
+
+    def _requested_increase(self, dominant_zone, demand):
+        """return the dominant zone and its temperature increase, both None without demand or when turned off"""
+        if dominant_zone is None or not self._enabled:
+            return None, None
+        return dominant_zone, round(demand, 1)
+
+    def _override_action(self, override_active: bool, temperature_increase: float):
+        """return the action which brings the override to the outcome of an evaluation, None if nothing changes"""
         if override_active and not self._override_active:
-            await self.async_start_override_mode(temperature_increase)
-        elif not override_active and self._override_active:
-            await self.async_stop_override_mode()
+            return ACTION_START
+        if not override_active and self._override_active:
+            return ACTION_STOP
+        if override_active and self._override_incomplete:
+            return ACTION_RESUME
+        if override_active and temperature_increase != self._temperature_increase:
+            return ACTION_UPDATE
+        return None
+
+    def _replacing_action(self, action: str):
+        """return the action which replaces the commands still being sent, if any, and whether it replaces them"""
+        if self._command_task is None or self._command_task.done():
+            return action, False
+        if action == ACTION_UPDATE and self._command_action in (ACTION_START, ACTION_RESUME):
+            # the replaced commands might not have set the mode yet
+            return ACTION_RESUME, True
+        return action, True
+
+    def _stores_controller_settings(self, replacing: bool):
+        """whether a starting override stores the current settings of the controller
+
+        A start which replaces a stop that is still being sent keeps the settings
+        stored before the previous override, as the controller might not show them yet.
+        """
+        return not (replacing and self._stored_controller_state is not None)
+
+    def _plan_commands(self, action: str, temperature_increase: float, controller_state, replacing: bool = False):
+        """return the commands to the controller for an action, as (kind, args), and the override setpoint
+
+        The commands are sent by async_start_override_mode, async_stop_override_mode and
+        async_update_override_setpoint, and returned by plan() without sending them.
+        When they replace commands which are still being sent, the controller might
+        not show the result of those yet, so no command is left out because the
+        controller already shows its value.
+        """
+        current_state = parse_state(controller_state)
+        profile = self._controller_profiles.get(controller_state)
+        commands = []
+
+        if action == ACTION_STOP:
+            # revert to the settings prior to the override
+            stored_state = self._stored_controller_state
+            stored_setpoint = self._stored_controller_setpoint
+            if (replacing or current_state.hvac_mode != stored_state) and stored_state is not None and (profile.is_climate or profile.is_switch):
+                commands.append((COMMAND_STATE, [stored_state]))
+            if (replacing or current_state.temperature != stored_setpoint) and isinstance(stored_setpoint, float) and profile.is_climate:
+                commands.append((COMMAND_TEMPERATURE, [stored_setpoint]))
+            return commands, None
+
+        starting = action == ACTION_START and self._stores_controller_settings(replacing)
+        setpoint = self._override_setpoint(temperature_increase, controller_state, starting)
+        if action in (ACTION_START, ACTION_RESUME) and (replacing or current_state.hvac_mode != HVACMode.HEAT):
+            # update to heat mode if needed
+            if (
+                action == ACTION_START and
+                profile.supports_heat_with_temperature and
+                self._controller_commands.combined_supported is not False
+            ):
+                return [(COMMAND_STATE_TEMPERATURE, [HVACMode.HEAT, setpoint])], setpoint
+            if profile.is_climate:
+                commands.append((COMMAND_STATE, [HVACMode.HEAT]))
+            elif profile.is_switch:
+                commands.append((COMMAND_STATE, [STATE_ON]))
+
+        # compare after quantization, both with the controller and with the last command
+        # for which the controller might not have reported the result yet
+        if setpoint is not None and (replacing or not (
+            setpoint == current_state.temperature or
+            self._controller_commands.was_sent(ATTR_TEMPERATURE, setpoint, self._controller_delay_time)
+        )):
+            commands.append((COMMAND_TEMPERATURE, [setpoint]))
+        return commands, setpoint
+
+    def _override_setpoint(self, temperature_increase: float, controller_state, starting: bool = False):
+        """return the controller setpoint of the override, None if the controller has no setpoint
+
+        A starting override takes the current settings of the controller as the stored ones.
+        """
+        if not self._controller_profiles.get(controller_state).is_climate:
+            return None
+        current_state = parse_state(controller_state)
+        if starting:
+            stored_state, stored_setpoint = current_state.hvac_mode, as_float(current_state.temperature)
         else:
-            await self.async_update_override_setpoint(temperature_increase)
+            stored_state, stored_setpoint = self._stored_controller_state, self._stored_controller_setpoint
+        return self._quantize_setpoint(
+            self._compute_override_setpoint(temperature_increase, current_state, stored_state, stored_setpoint),
+            controller_state,
+        )
 
-        self.async_write_ha_state()
+    def plan(self, zone_snapshots: dict = None):
+        """return the outcome of an evaluation of the override, without side effects
+
+        zone_snapshots optionally replaces fields of the zone states, by entity
+        and ZoneSnapshot field, e.g. {"climate.bedroom": {"temperature": 21}}.
+        """
+        zone_snapshots = zone_snapshots or {}
+        zones = {}
+        zone_demand = ZoneDemandIndex()
+        for entity in self._zone_entities:
+            if entity in zone_snapshots:
+                snapshot = parse_state(self.hass.states.get(entity))._replace(**zone_snapshots[entity])
+                current_temperature = self._measurement_filter.preview(entity, snapshot.current_temperature)
+                demand = compute_demand(snapshot._replace(current_temperature=current_temperature))
+            else:
+                snapshot = parse_state(self.hass.states.get(entity))
+                current_temperature = self._measurement_filter.get(entity)
+                demand = self._zone_demand.get(entity)
+            zone_demand.update(entity, demand)
+            zones[entity] = {
+                ATTR_HVAC_MODE: snapshot.hvac_mode,
+                ATTR_TEMPERATURE: snapshot.temperature,
+                "current_temperature": current_temperature,
+                "demand": demand,
+                "supplied": entity in zone_snapshots,
+            }
+
+        dominant_zone, temperature_increase = self._requested_increase(*zone_demand.dominant())
+        override_active, postponed_until = self._override_state.decide(
+            self._override_active, temperature_increase, self._enabled
+        )
+        temperature_increase = temperature_increase or 0
+        action = self._override_action(override_active, temperature_increase)
+        replacing = False
+        if action is not None:
+            action, replacing = self._replacing_action(action)
+
+        controller_state = self.hass.states.get(self._controller_entity) if self._controller_entity else None
+        current_state = parse_state(controller_state)
+        commands = []
+        setpoint = None
+        if self._controller_profiles is not None:
+            if action is not None:
+                commands, setpoint = self._plan_commands(action, temperature_increase, controller_state, replacing)
+            elif override_active:
+                setpoint = self._override_setpoint(temperature_increase, controller_state)
+
+        return {
+            "enabled": bool(self._enabled),
+            "evaluating": self._startup_gate.is_open,
+            "zones": zones,
+            const.ATTR_DOMINANT_ZONE: dominant_zone,
+            const.ATTR_TEMPERATURE_INCREASE: temperature_increase,
+            const.ATTR_OVERRIDE_ACTIVE: override_active,
+            "postponed_until": postponed_until.isoformat() if postponed_until else None,
+            "action": action,
+            "controller": {
+                "entity_id": self._controller_entity,
+                ATTR_HVAC_MODE: current_state.hvac_mode,
+                ATTR_TEMPERATURE: current_state.temperature,
+                "current_temperature": current_state.current_temperature,
+            },
+            "setpoint": setpoint,
+            "commands": [{"command": kind, "args": args} for kind, args in commands],
+        }
 
-    async def async_start_override_mode(self, temperature_increase: float):
-        """Start the override of the controller"""
+    @callback
+    def _async_override_guard_expired(self):
+        """minimum on- or off-time of the override has passed"""
+        self.hass.async_create_task(self.async_calculate_override())
 
+    async def async_start_override_mode(self, temperature_increase: float, replacing: bool = False):
+        """Start the override of the controller, its commands are sent in the background"""
+        controller_state = self.hass.states.get(self._controller_entity)
+        current_state = parse_state(controller_state)
+        commands, setpoint = self._plan_commands(ACTION_START, temperature_increase, controller_state, replacing)
+
+        previous_settings = (self._stored_controller_state, self._stored_controller_setpoint)
         self._override_active = True
-        current_state = parse_state(self.hass.states.get(self._controller_entity))
-        # store current controller entity settings for later
-        _LOGGER.debug("Storing controller state=%s", current_state)
-        self._stored_controller_state = current_state[ATTR_HVAC_MODE]
-        self._stored_controller_setpoint = current_state[ATTR_TEMPERATURE]
-
-        if current_state[ATTR_HVAC_MODE] != HVACMode.HEAT:
-            # uupdate to heat mode if needed
-            await self._ignore_controller_state_changes()
-            if compute_domain(self._controller_entity) == Platform.CLIMATE:
-                await async_set_hvac_mode(self.hass, self._controller_entity, HVACMode.HEAT)
-            elif compute_domain(self._controller_entity) == Platform.SWITCH:
-                await async_set_switch_state(self.hass, self._controller_entity, STATE_ON)
-
-        await self.async_update_override_setpoint(temperature_increase)
-
-    async def async_stop_override_mode(self):
-        """Stop the override of the controller and revert its prior settings"""
+        self._temperature_increase = temperature_increase
+        if self._stores_controller_settings(replacing):
+            # store current controller entity settings for later
+            _LOGGER.debug("Storing controller state=%s", current_state)
+            self._stored_controller_state = current_state.hvac_mode
+            self._stored_controller_setpoint = as_float(current_state.temperature)
+
+        @callback
+        def async_sent(sent, error):
+            if error is None:
+                self._override_incomplete = False
+            elif not sent:
+                # the controller was not changed, the override is started again by a next evaluation
+                self._override_active = False
+                self._temperature_increase = 0
+                self._stored_controller_state, self._stored_controller_setpoint = previous_settings
+                self._override_state.revert()
+                self._async_schedule_retry(ACTION_START, error)
+            else:
+                # the controller was partly changed, the override stays active and its commands are sent again
+                self._override_incomplete = True
+                self._async_schedule_retry(ACTION_START, error)
+
+        self._async_dispatch_commands(ACTION_START, commands, setpoint, controller_state, async_sent)
+
+    async def async_stop_override_mode(self, replacing: bool = False):
+        """Stop the override of the controller and revert its prior settings, its commands are sent in the background"""
         if not self._override_active:
             return
 
         _LOGGER.debug("Stopping override mode")
+        controller_state = self.hass.states.get(self._controller_entity)
+        commands, _ = self._plan_commands(ACTION_STOP, 0, controller_state, replacing)
+        temperature_increase = self._temperature_increase
         self._override_active = False
         self._temperature_increase = 0
 
-        current_state = parse_state(self.hass.states.get(self.entity_id))
+        @callback
+        def async_sent(sent, error):
+            if error is not None:
+                # the prior settings are kept, such that the stop is tried again by a next evaluation
+                self._override_active = True
+                self._temperature_increase = temperature_increase
+                self._override_state.revert()
+                self._async_schedule_retry(ACTION_STOP, error)
+                return
+
+            self._override_incomplete = False
+            if not self._override_active:
+                self._stored_controller_setpoint = None
+                self._stored_controller_state = None
+
+        self._async_dispatch_commands(ACTION_STOP, commands, None, controller_state, async_sent)
+
+    async def async_update_override_setpoint(self, temperature_increase: float, action: str = ACTION_UPDATE, replacing: bool = False):
+        """Update the override setpoint of the controller, with ACTION_RESUME also its mode"""
+        self._temperature_increase = temperature_increase
+        controller_state = self.hass.states.get(self._controller_entity)
+        commands, setpoint = self._plan_commands(action, temperature_increase, controller_state, replacing)
 
-        if current_state[ATTR_HVAC_MODE] != self._stored_controller_state and self._stored_controller_state is not None:
-            if compute_domain(self._controller_entity) == Platform.CLIMATE:
-                await async_set_hvac_mode(self.hass, self._controller_entity, self._stored_controller_state)
-            elif compute_domain(self._controller_entity) == Platform.SWITCH:
-                await async_set_switch_state(self.hass, self._controller_entity, self._stored_controller_state)
+        @callback
+        def async_sent(sent, error):
+            if error is not None:
+                self._override_incomplete = True
+                self._async_schedule_retry(action, error)
+            elif action == ACTION_RESUME:
+                self._override_incomplete = False
+
+        self._async_dispatch_commands(action, commands, setpoint, controller_state, async_sent)
+
+    @callback
+    def _async_dispatch_commands(self, action: str, commands, setpoint, controller_state, on_sent):
+        """send the commands of an action in the background, replacing the commands of a previous action
+
+        Commands of the previous action which were not sent yet are dropped, a
+        command which is being sent is finished by the command queue. on_sent is
+        called with the result of _async_send_commands, unless the commands are
+        replaced in the meantime.
+        """
+        if self._command_task is not None and not self._command_task.done():
+            _LOGGER.debug("Replacing the commands of override %s by those of %s", self._command_action, action)
+            self._command_task.cancel()
+            self._metrics.increment("commands_replaced")
+
+        async def async_send():
+            sent, error = await self._async_send_commands(commands, setpoint, controller_state)
+            on_sent(sent, error)
+            self.async_write_ha_state()
 
-        if (
-            current_state[ATTR_TEMPERATURE] != self._stored_controller_setpoint and
-            isinstance(self._stored_controller_setpoint, float) and
-            compute_domain(self._controller_entity) == Platform.CLIMATE
-        ):
-            await async_set_temperature(self.hass, self._controller_entity, self._stored_controller_setpoint)
+        self._command_action = action
+        self._command_task = self.hass.async_create_task(async_send())
 
-        self._stored_controller_setpoint = None
-        self._stored_controller_state = None
+    async def _async_send_commands(self, commands, setpoint, controller_state):
+        """send the commands planned by _plan_commands to the controller, in order
 
-    async def async_update_override_setpoint(self, temperature_increase: float):
-        """Update the override setpoint of the controller"""
+        Returns the number of commands which were sent, and the exception of the
+        command which failed (after the retries of the command queue) or None.
+        """
+        profile = self._controller_profiles.get(controller_state)
+        if setpoint is not None and not any(kind != COMMAND_STATE for kind, _ in commands):
+            self._controller_commands.record_suppressed()
 
-        self._temperature_increase = temperature_increase
+        commands = list(commands)
+        sent = 0
+        try:
+            while commands:
+                kind, args = commands.pop(0)
+                _LOGGER.debug("Sending %s=%s to controller (current state=%s)", kind, args, parse_state(controller_state))
+                if kind == COMMAND_STATE_TEMPERATURE:
+                    done, remaining = await self._async_start_override_combined(*args)
+                    commands[:0] = remaining
+                    if not done:
+                        continue
+                elif kind == COMMAND_TEMPERATURE:
+                    await self._controller_commands.async_set_temperature(*args)
+                elif profile.is_climate:
+                    await self._controller_commands.async_set_hvac_mode(*args)
+                else:
+                    await self._controller_commands.async_set_switch_state(*args)
+                sent += 1
+        except Exception as exc:
+            # the failure is logged and counted by the command queue
+            return sent, exc
+        return sent, None
+
+    async def _async_start_override_combined(self, hvac_mode: str, setpoint: float):
+        """set heat mode and override setpoint in a single call
+
+        Some controllers (e.g. generic_thermostat) accept the call but ignore the
+        hvac mode, so the resulting mode is verified. If the controller reports a
+        new state without the mode, the mode is set separately, now and for later
+        overrides. If it reports no new state in time, the mode is set separately
+        now and the combined call is tried again on the next start.
+
+        Returns whether it was sent, and the commands which must still be sent.
+        """
+        commands = self._controller_commands
+        previous_state = self.hass.states.get(self._controller_entity)
+        try:
+            sent = await commands.async_set_hvac_mode_and_temperature(hvac_mode, setpoint)
+        except Exception as exc:
+            _LOGGER.warning("Combined update of controller failed, falling back to separate calls: %s", exc)
+            commands.combined_supported = False
+            return False, [(COMMAND_STATE, [hvac_mode]), (COMMAND_TEMPERATURE, [setpoint])]
+        if sent is False:
+            return True, []
+        if await commands.async_confirm(COMMAND_STATE, [hvac_mode], self._controller_delay_time):
+            commands.combined_supported = True
+            return True, []
+        state = self.hass.states.get(self._controller_entity)
+        if state is None or previous_state is None or state.last_updated == previous_state.last_updated:
+            _LOGGER.debug(
+                "Controller %s reported no new state after a combined update, setting the hvac mode separately",
+                self._controller_entity
+            )
+            return True, [(COMMAND_STATE, [hvac_mode])]
+        _LOGGER.info(
+            "Controller %s ignored the hvac mode of a combined update, setting it separately", self._controller_entity
+        )
+        commands.combined_supported = False
+        return True, [(COMMAND_STATE, [hvac_mode])]
+
+    @callback
+    def _async_schedule_retry(self, action: str, error):
+        """evaluate the override again when the commands of an action failed"""
+        _LOGGER.debug("Override %s failed, evaluating again in %ss: %s", action, MAX_RETRY_BACKOFF, error)
+        self._metrics.increment("override_failures")
+        self._trace.add(
+            TRACE_EVALUATE, self._dominant_zone, None, self._temperature_increase, self._override_active, action + "_failed"
+        )
+        self._cancel_retry()
+
+        @callback
+        def timer_finished(now):
+            self._retry_timer = None
+            self.hass.async_create_task(self.async_calculate_override())
 
+        self._retry_timer = async_track_point_in_time(
+            self.hass, timer_finished, dt_util.utcnow() + datetime.timedelta(seconds=MAX_RETRY_BACKOFF)
+        )
+
+    def _cancel_retry(self):
+        """discard a scheduled evaluation after a failed action"""
+        if self._retry_timer:
+            self._retry_timer()
+        self._retry_timer = None
+
+    def _compute_override_setpoint(self, temperature_increase: float, current_state, stored_state, stored_setpoint):
+        """determine the controller setpoint needed for the requested temperature increase"""
         controller_setpoint = 0
         if (
-            self._stored_controller_state == HVACMode.HEAT and
-            isinstance(self._stored_controller_setpoint, float)
+            stored_state == HVACMode.HEAT and
+            isinstance(stored_setpoint, float)
          ):
-            controller_setpoint = self._stored_controller_setpoint
+            controller_setpoint = stored_setpoint
 
-        controller_state = self.hass.states.get(self._controller_entity)
-        current_state = parse_state(controller_state)
         override_setpoint = 0
 
-        if isinstance(current_state[ATTR_CURRENT_TEMPERATURE], (int, float)):
+        if isinstance(current_state.current_temperature, (int, float)):
             override_setpoint = min([
-                current_state[ATTR_CURRENT_TEMPERATURE] + temperature_increase,
+                current_state.current_temperature + temperature_increase,
                 self._max_setpoint
             ])
         # else:
             # TBD: mirror setpoint of zone to controller
 
-        new_setpoint = max([override_setpoint, controller_setpoint])
+        return max([override_setpoint, controller_setpoint])
 
-        if (
-            new_setpoint != current_state[ATTR_TEMPERATURE] and
-            compute_domain(self._controller_entity) == Platform.CLIMATE
-        ):
-            setpoint_resolution = controller_state.attributes.get(ATTR_TARGET_TEMP_STEP, 0.5)
-            new_setpoint = round(new_setpoint / setpoint_resolution) * setpoint_resolution
-            _LOGGER.debug("Updating override setpoint=%s (current controller setpoint=%s)", new_setpoint, current_state[ATTR_TEMPERATURE])
-            await self._ignore_controller_state_changes()
-            try:
-                await async_set_temperature(self.hass, self._controller_entity, new_setpoint)
-                # Read back controller state immediately and log its setpoint
-                try:
-                    post_state = parse_state(self.hass.states.get(self._controller_entity))
-                    _LOGGER.debug("Controller post-update setpoint=%s mode=%s action=%s", post_state.get(ATTR_TEMPERATURE), post_state.get(ATTR_HVAC_MODE), post_state.get(ATTR_HVAC_ACTION))
-                except Exception:
-                    _LOGGER.debug("Controller post-update read failed")
-            except Exception as exc:
-                _LOGGER.exception("Failed to set controller temperature to %s: %s", new_setpoint, exc)
+    def _quantize_setpoint(self, setpoint: float, controller_state):
+        """round the setpoint to the step of the controller, within its range"""
+        profile = self._controller_profiles.get(controller_state)
+        return profile.quantize(profile.clamp(setpoint))
 
     async def async_turn_off_zones(self):
         """turn off all zones"""
         entity_list = [
             entity
             for entity in self._zone_entities
-            if parse_state(self.hass.states.get(entity))[ATTR_HVAC_MODE] == HVACMode.HEAT
+            if parse_state(self.hass.states.get(entity)).hvac_mode == HVACMode.HEAT
         ]
         if not len(entity_list):
             return
 
         _LOGGER.debug("Turning off zones %s", ", ".join(entity_list))
-        await async_set_hvac_mode(self.hass, entity_list, HVACMode.OFF)
-
-    async def _ignore_controller_state_changes(self):
-        """temporarily stop watching for state changes of the controller"""
-        if self._ignore_controller_state_change_timer:
-            self._ignore_controller_state_change_timer()
-
-        _LOGGER.debug("start ignoring controller state changes")
-
-        now = dt_util.utcnow()
-        delay = datetime.timedelta(seconds=self._controller_delay_time)
-
-        @callback
-        async def timer_finished(now):
-            _LOGGER.debug("stop ignoring controller state changes")
-            self._ignore_controller_state_change_timer = None
-
-        self._ignore_controller_state_change_timer = async_track_point_in_time(
-            self.hass, timer_finished, now + delay
-        )
+        await async_command_zones(self.hass, entity_list, hvac_mode=HVACMode.OFF, timeout=self._command_timeout)
@@ -0,0 +1,45 @@
+"""In-memory trace of the recent decisions of zoned heating."""
+from collections import deque
+import homeassistant.util.dt as dt_util
+
+# number of records which are kept
+TRACE_SIZE = 200
+
+TRACE_ZONE = "zone"
+TRACE_CONTROLLER = "controller"
+TRACE_EVALUATE = "evaluate"
+TRACE_COMMAND = "command"
+
+# names of the values of a record, by type
+FIELDS = {
+    TRACE_ZONE: ("entity", "hvac_mode", "temperature", "current_temperature", "hvac_action", "demand", "changed"),
+    TRACE_CONTROLLER: ("entity", "hvac_mode", "temperature", "outcome"),
+    TRACE_EVALUATE: ("dominant_zone", "demand", "temperature_increase", "override_active", "action"),
+    TRACE_COMMAND: ("command", "args", "context"),
+}
+
+
+class Trace:
+    """Ring buffer of structured records.
+
+    A record is stored as a tuple of its time, type and values, and only
+    converted to a dict when the trace is read, such that adding a record in
+    the handling of an event is cheap.
+    """
+
+    def __init__(self, size: int = TRACE_SIZE):
+        self._records = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, record_type: str, *values):
+        """add a record with the values of FIELDS[record_type], the oldest record is dropped when the trace is full"""
+        self._records.append((dt_util.utcnow(), record_type, values))
+
+    def as_list(self):
+        """return the records, oldest first"""
+        return [
+            {"time": time.isoformat(), "type": record_type, **dict(zip(FIELDS[record_type], values))}
+            for time, record_type, values in self._records
+        ]
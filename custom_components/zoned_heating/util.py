@@ -1,5 +1,8 @@
-
+import asyncio
+import datetime
 import logging
+import weakref
+from typing import NamedTuple, Optional
 
 from homeassistant.const import (
     ATTR_TEMPERATURE,
@@ -11,51 +14,151 @@ from homeassistant.const import (
     SERVICE_TURN_ON,
     SERVICE_TURN_OFF,
     STATE_ON,
+    ATTR_SUPPORTED_FEATURES,
     Platform,
 )
 from homeassistant.components.climate.const import (
     ATTR_HVAC_MODE,
     ATTR_CURRENT_TEMPERATURE,
     ATTR_HVAC_ACTION,
+    ATTR_HVAC_MODES,
+    ClimateEntityFeature,
     HVACMode,
     HVACAction,
     SERVICE_SET_HVAC_MODE,
     SERVICE_SET_TEMPERATURE,
 )
 from homeassistant.core import (
+    Context,
     HomeAssistant,
+    callback,
 )
+from homeassistant.helpers.event import async_track_point_in_time
+import homeassistant.util.dt as dt_util
+
+from . import const
 
 _LOGGER = logging.getLogger(__name__)
 
+ZONE_ATTRIBUTES = (ATTR_TEMPERATURE, ATTR_CURRENT_TEMPERATURE, ATTR_HVAC_ACTION)
+CONTROLLER_ATTRIBUTES = (ATTR_TEMPERATURE,)
+
+
+class ZoneSnapshot(NamedTuple):
+    """Immutable view of the relevant fields of a climate (or switch) state."""
+
+    hvac_mode: Optional[str]
+    temperature: Optional[float]
+    current_temperature: Optional[float]
+    hvac_action: Optional[str]
+
+
+EMPTY_SNAPSHOT = ZoneSnapshot(None, None, None, HVACAction.OFF)
+
+# parsed snapshot per state object, such that each state is parsed only once; an
+# entry is dropped when Home Assistant no longer references its state
+_snapshot_cache = weakref.WeakKeyDictionary()
 
-def parse_state(state):
-    data = {}
 
-    for key in [ATTR_TEMPERATURE, ATTR_CURRENT_TEMPERATURE, ATTR_HVAC_ACTION]:
-        data[key] = state.attributes.get(key) if state and state.attributes else None
+def get_entry_options(config_entry) -> dict:
+    """return the options of a config entry, including settings stored in its data by older versions"""
+    options = dict(config_entry.options)
+    options.setdefault(const.CONF_HYSTERESIS, config_entry.data.get(const.CONF_HYSTERESIS, const.DEFAULT_HYSTERESIS))
+    return options
 
-    data[ATTR_HVAC_MODE] = state.state if state else None
 
-    if data[ATTR_HVAC_ACTION] is None:
+def as_float(value) -> Optional[float]:
+    """return a numeric value as float, None for anything else"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def parse_state(state) -> ZoneSnapshot:
+    if state is None:
+        return EMPTY_SNAPSHOT
+
+    cached = _snapshot_cache.get(state)
+    if cached is not None:
+        return cached
+
+    attributes = state.attributes or {}
+    hvac_mode = state.state
+    temperature = attributes.get(ATTR_TEMPERATURE)
+    current_temperature = attributes.get(ATTR_CURRENT_TEMPERATURE)
+    hvac_action = attributes.get(ATTR_HVAC_ACTION)
+
+    if hvac_action is None:
         if (
-            data[ATTR_TEMPERATURE] is not None and
-            data[ATTR_CURRENT_TEMPERATURE] is not None and
-            data[ATTR_HVAC_MODE] in [HVACMode.OFF, HVACMode.HEAT]
+            temperature is not None and
+            current_temperature is not None and
+            hvac_mode in [HVACMode.OFF, HVACMode.HEAT]
         ):
-            if data[ATTR_HVAC_MODE] == HVACMode.OFF:
-                data[ATTR_HVAC_ACTION] = HVACAction.OFF
-            elif data[ATTR_TEMPERATURE] > data[ATTR_CURRENT_TEMPERATURE]:
-                data[ATTR_HVAC_ACTION] = HVACAction.HEATING
+            if hvac_mode == HVACMode.OFF:
+                hvac_action = HVACAction.OFF
+            elif temperature > current_temperature:
+                hvac_action = HVACAction.HEATING
             else:
-                data[ATTR_HVAC_ACTION] = HVACAction.IDLE
+                hvac_action = HVACAction.IDLE
         else:
-            data[ATTR_HVAC_ACTION] = HVACAction.OFF
-
-    return data
+            hvac_action = HVACAction.OFF
+
+    snapshot = ZoneSnapshot(hvac_mode, temperature, current_temperature, hvac_action)
+    _snapshot_cache[state] = snapshot
+    return snapshot
+
+
+def has_relevant_change(old_state, new_state, attributes):
+    """whether the state or one of the given attributes differs between two states"""
+    if old_state is None or new_state is None:
+        return old_state is not new_state
+    if old_state.state != new_state.state:
+        return True
+    old_attributes = old_state.attributes
+    new_attributes = new_state.attributes
+    for key in attributes:
+        if old_attributes.get(key) != new_attributes.get(key):
+            return True
+    return False
+
+
+async def async_wait_for(hass: HomeAssistant, target, timeout: float):
+    """await a coroutine within timeout seconds (0 for no limit), raises asyncio.TimeoutError"""
+    if not timeout:
+        return await target
+    task = hass.async_create_task(target)
+    timed_out = False
+
+    @callback
+    def timer_finished(now):
+        nonlocal timed_out
+        if not task.done():
+            timed_out = True
+            task.cancel()
+
+    remove_timer = async_track_point_in_time(
+        hass, timer_finished, dt_util.utcnow() + datetime.timedelta(seconds=timeout)
+    )
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if timed_out:
+            raise asyncio.TimeoutError("no result within {}s".format(timeout)) from None
+        raise
+    finally:
+        remove_timer()
+
+
+async def async_call_service(hass: HomeAssistant, params: dict, context: Context = None, blocking: bool = True):
+    """call a service, without blocking it only waits until the call is scheduled and errors are logged by Home Assistant"""
+    await hass.services.async_call(
+        **params,
+        blocking=blocking,
+        context=context,
+    )
 
 
-async def async_set_hvac_mode(hass: HomeAssistant, entity_ids, hvac_mode: str):
+async def async_set_hvac_mode(hass: HomeAssistant, entity_ids, hvac_mode: str, context: Context = None, blocking: bool = True):
     """helper for setting hvac_mode"""
     params = {
         CONF_DOMAIN: Platform.CLIMATE,
@@ -67,17 +170,10 @@ async def async_set_hvac_mode(hass: HomeAssistant, entity_ids, hvac_mode: str):
             CONF_ENTITY_ID: entity_ids
         }
     }
-    service_task = hass.async_create_task(
-        hass.services.async_call(
-            **params,
-            blocking=True,
-            context={},
-        )
-    )
-    await service_task
+    await async_call_service(hass, params, context, blocking)
 
 
-async def async_set_temperature(hass: HomeAssistant, entity_ids, temperature: float):
+async def async_set_temperature(hass: HomeAssistant, entity_ids, temperature: float, context: Context = None, blocking: bool = True):
     """helper for setting temperature setpoint"""
     params = {
         CONF_DOMAIN: Platform.CLIMATE,
@@ -89,17 +185,37 @@ async def async_set_temperature(hass: HomeAssistant, entity_ids, temperature: fl
             CONF_ENTITY_ID: entity_ids
         }
     }
-    service_task = hass.async_create_task(
-        hass.services.async_call(
-            **params,
-            blocking=True,
-            context={},
-        )
+    await async_call_service(hass, params, context, blocking)
+
+
+async def async_set_hvac_mode_and_temperature(hass: HomeAssistant, entity_ids, hvac_mode: str, temperature: float, context: Context = None, blocking: bool = True):
+    """helper for setting hvac_mode and temperature setpoint in a single call"""
+    params = {
+        CONF_DOMAIN: Platform.CLIMATE,
+        CONF_SERVICE: SERVICE_SET_TEMPERATURE,
+        ATTR_SERVICE_DATA: {
+            ATTR_HVAC_MODE: hvac_mode,
+            ATTR_TEMPERATURE: temperature,
+        },
+        CONF_TARGET: {
+            CONF_ENTITY_ID: entity_ids
+        }
+    }
+    await async_call_service(hass, params, context, blocking)
+
+
+def supports_hvac_mode_with_temperature(state, hvac_mode: str):
+    """whether a climate entity accepts the hvac_mode in a set_temperature call"""
+    if not state or not state.attributes:
+        return False
+    supported_features = state.attributes.get(ATTR_SUPPORTED_FEATURES) or 0
+    return (
+        bool(supported_features & ClimateEntityFeature.TARGET_TEMPERATURE) and
+        hvac_mode in (state.attributes.get(ATTR_HVAC_MODES) or [])
     )
-    await service_task
 
 
-async def async_set_switch_state(hass: HomeAssistant, entity_ids, state: str):
+async def async_set_switch_state(hass: HomeAssistant, entity_ids, state: str, context: Context = None, blocking: bool = True):
     """helper for setting switch state"""
     params = {
         CONF_DOMAIN: Platform.SWITCH,
@@ -110,14 +226,7 @@ async def async_set_switch_state(hass: HomeAssistant, entity_ids, state: str):
             CONF_ENTITY_ID: entity_ids
         }
     }
-    service_task = hass.async_create_task(
-        hass.services.async_call(
-            **params,
-            blocking=True,
-            context={},
-        )
-    )
-    await service_task
+    await async_call_service(hass, params, context, blocking)
 
 
 def compute_domain(entity_id: str):
@@ -0,0 +1,82 @@
+"""Commands to a set of zone entities."""
+import asyncio
+import logging
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+
+from .util import (
+    async_wait_for,
+    async_set_hvac_mode,
+    async_set_temperature,
+    async_set_hvac_mode_and_temperature,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# maximum number of service calls to the zones which run at the same time
+MAX_CONCURRENT_CALLS = 4
+
+# group of the zones which are not in the entity registry
+UNKNOWN_INTEGRATION = "unknown"
+
+
+def group_zones(hass: HomeAssistant, entity_ids):
+    """return the zones by the integration which provides them"""
+    registry = er.async_get(hass)
+    groups = {}
+    for entity_id in entity_ids:
+        entry = registry.async_get(entity_id)
+        groups.setdefault(entry.platform if entry else UNKNOWN_INTEGRATION, []).append(entity_id)
+    return groups
+
+
+async def async_command_zones(
+    hass: HomeAssistant,
+    entity_ids,
+    hvac_mode: str = None,
+    temperature: float = None,
+    timeout: float = 0,
+    concurrency: int = MAX_CONCURRENT_CALLS,
+):
+    """set the hvac mode and/or setpoint of zones, returns the result per zone
+
+    The zones of an integration are updated with a single service call, the
+    integrations at the same time, at most concurrency calls at once. When the
+    call for an integration fails, its zones are retried one by one, such that
+    a single failing zone does not fail the others.
+    """
+    semaphore = asyncio.Semaphore(max(int(concurrency or 1), 1))
+    results = {}
+
+    async def async_call(zones):
+        async with semaphore:
+            if hvac_mode is not None and temperature is not None:
+                call = async_set_hvac_mode_and_temperature(hass, zones, hvac_mode, temperature)
+            elif hvac_mode is not None:
+                call = async_set_hvac_mode(hass, zones, hvac_mode)
+            else:
+                call = async_set_temperature(hass, zones, temperature)
+            await async_wait_for(hass, call, timeout)
+
+    async def async_command_group(integration, zones):
+        try:
+            await async_call(zones)
+        except Exception as exc:
+            if len(zones) == 1:
+                _LOGGER.warning("Command to zone %s failed: %s", zones[0], str(exc) or type(exc).__name__)
+                results[zones[0]] = {"integration": integration, "success": False, "error": str(exc) or type(exc).__name__}
+                return
+            _LOGGER.debug("Command to zones %s failed, sending it per zone: %s", zones, exc)
+            await asyncio.gather(*(async_command_group(integration, [zone]) for zone in zones))
+            return
+        for zone in zones:
+            results[zone] = {"integration": integration, "success": True}
+
+    groups = group_zones(hass, entity_ids)
+    _LOGGER.debug("Sending hvac_mode=%s temperature=%s to zones %s", hvac_mode, temperature, groups)
+    await asyncio.gather(*(
+        async_command_group(integration, zones)
+        for integration, zones in groups.items()
+    ))
+    return {entity_id: results[entity_id] for entity_id in entity_ids if entity_id in results}